@@ -0,0 +1,80 @@
+import os
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from config import (
+    db_source,
+    async_db_source,
+    async_db_pool_size,
+    async_db_max_overflow,
+    db_pool_timeout,
+    db_pool_recycle,
+    db_pool_pre_ping,
+)
+from database import PoolMetrics, TimedPoolMixin, count_pool_events
+
+# Async drivers for the sync URLs used in DB_SOURCE
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """
+    Turn a sync database URL into one for the matching async driver,
+    e.g. postgresql://... -> postgresql+asyncpg://...
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in _ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}' URLs; set ASYNC_DB_SOURCE")
+    parsed = parsed.set(drivername=_ASYNC_DRIVERS[backend])
+    if backend == "postgresql" and "sslmode" in parsed.query:
+        # asyncpg spells libpq's sslmode as ssl
+        sslmode = parsed.query["sslmode"]
+        parsed = parsed.difference_update_query(["sslmode"]).update_query_dict({"ssl": sslmode})
+    return parsed.render_as_string(hide_password=False)
+
+
+async_pool_metrics = PoolMetrics()
+
+
+class TimedAsyncQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    metrics = async_pool_metrics
+
+
+def _engine_kwargs(url: str) -> dict:
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "poolclass": TimedAsyncQueuePool,
+        "pool_size": async_db_pool_size,
+        "max_overflow": async_db_max_overflow,
+        "pool_timeout": db_pool_timeout,
+        "pool_recycle": db_pool_recycle,
+        "pool_pre_ping": db_pool_pre_ping,
+    }
+
+
+_url = async_db_source or to_async_url(db_source)
+
+# Create async engine
+async_engine = create_async_engine(_url, **_engine_kwargs(_url))
+
+# Same as for the sync engine (database.py)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=lambda: async_engine.sync_engine.dispose(close=False))
+
+count_pool_events(async_engine.sync_engine, async_pool_metrics)
+
+
+def get_async_pool_stats() -> dict:
+    return async_pool_metrics.snapshot(async_engine.sync_engine.pool)
+
+# Create async session. expire_on_commit=False: objects stay readable after
+# commit, since lazy attribute refreshes aren't possible under asyncio.
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
@@ -0,0 +1,70 @@
+"""
+Async versions of the repository.py functions used by the search endpoints,
+which run on the event loop.
+
+Same names, arguments and return values as in repository.py, but each takes
+an AsyncSession (see async_database.AsyncSessionLocal) and must be awaited:
+
+    async with AsyncSessionLocal() as db:
+        users = await async_repository.get_users_by_ids(db, supplier_ids)
+
+Add a function here only when an async handler needs it.
+"""
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import models, schemas
+from typing import List, Dict
+import utils
+
+
+async def _all(db: AsyncSession, stmt):
+    result = await db.execute(stmt)
+    return list(result.scalars().all())
+
+
+async def _add_and_commit(db: AsyncSession, obj):
+    db.add(obj)
+    await db.commit()
+    await db.refresh(obj)
+    return obj
+
+# ------------------------
+# Users
+# ------------------------
+async def get_users_by_ids(db: AsyncSession, user_ids: List[str]) -> Dict[str, models.User]:
+    ids = set(user_ids)
+    if not ids:
+        return {}
+    users = await _all(db, select(models.User).where(models.User.id.in_(ids)))
+    return {u.id: u for u in users}
+
+# ------------------------
+# Posts
+# ------------------------
+async def create_post(db: AsyncSession, post: schemas.PostCreate):
+    db_post = models.Post(
+        id=utils.generate_uuid(),
+        title=post.title,
+        description=post.description,
+        category=post.category,
+        status=post.status,
+        requester_id=post.requester_id
+    )
+    return await _add_and_commit(db, db_post)
+
+# ------------------------
+# Reviews
+# ------------------------
+async def get_supplier_avg_ratings(db: AsyncSession, supplier_ids: List[str]) -> Dict[str, float]:
+    ids = set(supplier_ids)
+    if not ids:
+        return {}
+    result = await db.execute(
+        select(models.SupplierRatingSummary.supplier_id, models.SupplierRatingSummary.avg_rating)
+        .where(models.SupplierRatingSummary.supplier_id.in_(ids))
+    )
+    ratings = {sup_id: 0.0 for sup_id in ids}
+    for sup_id, avg in result.all():
+        if avg:
+            ratings[sup_id] = float(avg)
+    return ratings
@@ -7,4 +7,62 @@ load_dotenv()
 # Access the variables
 host = os.getenv("HOST")
 port = os.getenv("PORT")
-db_source = os.getenv("DB_SOURCE")
\ No newline at end of file
+db_source = os.getenv("DB_SOURCE")
+
+# SQLAlchemy connection pool
+db_pool_size = int(os.getenv("DB_POOL_SIZE", "5"))
+db_max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+db_pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+db_pool_recycle = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+db_pool_pre_ping = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Async engine URL; derived from DB_SOURCE (asyncpg / aiosqlite driver) when unset
+async_db_source = os.getenv("ASYNC_DB_SOURCE")
+# Async engine's pool (search endpoints), separate from the sync one: a worker
+# may hold up to both pools' size + overflow connections
+async_db_pool_size = int(os.getenv("ASYNC_DB_POOL_SIZE", str(db_pool_size)))
+async_db_max_overflow = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", str(db_max_overflow)))
+
+# Query-embedding cache (entries, seconds)
+embedding_cache_size = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+embedding_cache_ttl = float(os.getenv("EMBEDDING_CACHE_TTL", "3600"))
+
+# LLM response cache (entries, seconds, SQLite file; empty path = memory only)
+llm_cache_size = int(os.getenv("LLM_CACHE_SIZE", "2048"))
+llm_cache_ttl = float(os.getenv("LLM_CACHE_TTL", "86400"))
+llm_cache_path = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+
+# Per-result structured summaries (parallel GPT calls, seconds per call)
+summary_concurrency = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+summary_timeout = float(os.getenv("SUMMARY_TIMEOUT", "20"))
+# "per_document" (one GPT call per result) or "batch" (one call for the page)
+summary_mode = os.getenv("SUMMARY_MODE", "per_document")
+
+# In-process service catalog: max age (seconds) before re-reading services from Postgres
+service_catalog_ttl = float(os.getenv("SERVICE_CATALOG_TTL", "60"))
+
+# Background PDF ingestion (worker threads per process, embedding jobs at once,
+# attempts per job, base retry delay in seconds, SQLite job table; ":memory:" = in-process only)
+ingest_workers = int(os.getenv("INGEST_WORKERS", "2"))
+ingest_max_embedding_jobs = int(os.getenv("INGEST_MAX_EMBEDDING_JOBS", "1"))
+ingest_max_attempts = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+ingest_retry_backoff = float(os.getenv("INGEST_RETRY_BACKOFF", "5"))
+ingest_queue_path = os.getenv("INGEST_QUEUE_PATH", "ingestion_jobs.sqlite3")
+
+# Uploaded PDFs: size limit and copy buffer (bytes)
+max_upload_bytes = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+upload_chunk_size = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+# Parallel PDF page extraction (processes; PDFs with fewer pages are chunked sequentially)
+pdf_extract_workers = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+pdf_parallel_min_pages = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))
+
+# Vector search backend: "atlas" ($vectorSearch) or "local" (in-process index over the
+# chunks collection, for plain MongoDB). The local index is saved to VECTOR_INDEX_PATH;
+# "auto" switches from exact search to HNSW at VECTOR_ANN_THRESHOLD chunks
+vector_store_backend = os.getenv("VECTOR_STORE", "atlas")
+vector_index_path = os.getenv("VECTOR_INDEX_PATH", "vector_index")
+vector_index_type = os.getenv("VECTOR_INDEX_TYPE", "auto")
+vector_ann_threshold = int(os.getenv("VECTOR_ANN_THRESHOLD", "20000"))
+hnsw_m = int(os.getenv("HNSW_M", "16"))
+hnsw_ef_construction = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+hnsw_ef = int(os.getenv("HNSW_EF", "64"))
\ No newline at end of file
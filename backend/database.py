@@ -1,13 +1,136 @@
-from sqlalchemy import create_engine
+import os
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from config import db_source
+from sqlalchemy.pool import QueuePool
+from config import (
+    db_source,
+    db_pool_size,
+    db_max_overflow,
+    db_pool_timeout,
+    db_pool_recycle,
+    db_pool_pre_ping,
+)
+
+
+class PoolMetrics:
+    """
+    Counters for the engine's connection pool: how often connections are
+    checked out, how long callers waited for one, and how many timed out.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.total_wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def incr(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self, pool=None) -> dict:
+        with self._lock:
+            stats = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(1000 * self.total_wait_seconds / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(1000 * self.max_wait_seconds, 3),
+            }
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+                "checked_in": pool.checkedin(),
+            })
+        return stats
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedPoolMixin:
+    """
+    Pool mixin that records how long each checkout waited for a connection
+    in the class's `metrics`.
+    """
+
+    metrics = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except Exception:
+            self.metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record_wait(time.perf_counter() - start)
+        return conn
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    metrics = pool_metrics
+
+
+def count_pool_events(engine, metrics: PoolMetrics):
+    """
+    Count connects, checkouts and checkins of engine's pool in metrics.
+    """
+    event.listen(engine, "connect", lambda *args: metrics.incr("connects"))
+    event.listen(engine, "checkout", lambda *args: metrics.incr("checkouts"))
+    event.listen(engine, "checkin", lambda *args: metrics.incr("checkins"))
+
+
+def _engine_kwargs(url: str) -> dict:
+    if make_url(url).get_backend_name() == "sqlite":
+        # SQLite picks its own pool class; sizing options don't apply
+        return {}
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": db_pool_size,
+        "max_overflow": db_max_overflow,
+        "pool_timeout": db_pool_timeout,
+        "pool_recycle": db_pool_recycle,
+        "pool_pre_ping": db_pool_pre_ping,
+    }
+
 
 # Create engine
-engine = create_engine(db_source)
+engine = create_engine(db_source, **_engine_kwargs(db_source))
+
+# A pre-forking server (gunicorn --preload) imports this in the master: each
+# worker starts with an empty pool instead of the master's connections, which
+# are left open for the master (close=False)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+count_pool_events(engine, pool_metrics)
+
+
+def get_pool_stats() -> dict:
+    return pool_metrics.snapshot(engine.pool)
+
 
 # Create session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Create base
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
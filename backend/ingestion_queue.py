@@ -0,0 +1,292 @@
+"""
+Background queue for supplier PDF ingestion.
+
+Uploads are recorded as jobs in a small SQLite table and processed by a
+pool of worker threads, so the HTTP request only has to save the file:
+
+    job = ingestion_queue.submit(supplier_id, pdf_path)   # returns at once
+    ingestion_queue.get(job["id"])                        # status polling
+
+- Jobs that raise are retried with exponential backoff, up to max_attempts.
+- Per-supplier dedup: an upload supersedes that supplier's still-queued
+  job (only the latest résumé matters), and a supplier never has two jobs
+  running at once.
+- At most max_embedding_jobs jobs embed at the same time (embedding_slots);
+  the rest of a job (parsing, Mongo, LLM calls) isn't capped.
+
+With a file path the table is shared by every worker process on the host,
+so any process can answer a status poll; ":memory:" keeps it in-process.
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from pipeline.log_util import log_info, log_warning, log_error
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+SUPERSEDED = "superseded"
+
+_COLUMNS = (
+    "id", "supplier_id", "pdf_path", "status", "attempts", "result", "error",
+    "created_at", "updated_at", "run_after",
+)
+
+
+class IngestionQueue:
+    def __init__(
+        self,
+        handler,
+        sqlite_path=":memory:",
+        workers=2,
+        max_embedding_jobs=1,
+        max_attempts=3,
+        retry_backoff=5.0,
+        poll_interval=1.0,
+        stale_after=3600.0,
+    ):
+        """
+        handler(job, embedding_slots) does the ingestion for one job dict and
+        returns a JSON-able result; it should hold embedding_slots while it
+        embeds. Jobs left 'running' for stale_after seconds (their process
+        died) are put back in the queue.
+        """
+        self.handler = handler
+        self.sqlite_path = sqlite_path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.embedding_slots = threading.BoundedSemaphore(max(1, max_embedding_jobs))
+        self.max_embedding_jobs = max(1, max_embedding_jobs)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        # opened by the process that uses it (start(), after a pre-fork
+        # import), never shared across a fork
+        self._conn = None
+        self._conn_pid = None
+
+    # ---------- producer side ----------
+
+    def submit(self, supplier_id: str, pdf_path: str) -> dict:
+        """
+        Queue pdf_path for ingestion; the queue owns the file from now on and
+        deletes it once the job is finished (or superseded).
+        """
+        now = time.time()
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                superseded = conn.execute(
+                    "SELECT id, pdf_path FROM ingestion_jobs WHERE supplier_id = ? AND status = ?",
+                    (supplier_id, QUEUED),
+                ).fetchall()
+                conn.execute(
+                    "UPDATE ingestion_jobs SET status = ?, updated_at = ? WHERE supplier_id = ? AND status = ?",
+                    (SUPERSEDED, now, supplier_id, QUEUED),
+                )
+                conn.execute(
+                    "INSERT INTO ingestion_jobs (id, supplier_id, pdf_path, status, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (job_id, supplier_id, pdf_path, QUEUED, now, now),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        for old_id, old_path in superseded:
+            log_info("IngestionJobSuperseded", f"{old_id} by {job_id} (supplier {supplier_id})")
+            _remove_file(old_path)
+        log_info("IngestionJobQueued", f"{job_id} (supplier {supplier_id})")
+        self._wakeup.set()
+        return self.get(job_id)
+
+    def get(self, job_id: str):
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM ingestion_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return _job_dict(row) if row else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            conn = self._connection()
+            rows = conn.execute(
+                "SELECT status, COUNT(*) FROM ingestion_jobs GROUP BY status"
+            ).fetchall()
+        return {
+            "jobs": dict(rows),
+            "workers": self.workers,
+            "max_embedding_jobs": self.max_embedding_jobs,
+            "max_attempts": self.max_attempts,
+            "sqlite_path": self.sqlite_path,
+        }
+
+    # ---------- worker side ----------
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopping.clear()
+        # opens this process's connection
+        self._requeue_stale()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, name=f"ingest-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        log_info("IngestionQueueStarted", f"workers={self.workers}, max_embedding_jobs={self.max_embedding_jobs}")
+
+    def stop(self, timeout=None):
+        """
+        Stop taking new jobs and wait for running ones to finish.
+        """
+        self._stopping.set()
+        self._wakeup.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def _connection(self):
+        """
+        This process's connection, opened (and the table created) on first
+        use. Called with self._lock held.
+        """
+        if self._conn is not None and self._conn_pid == os.getpid():
+            return self._conn
+        conn = sqlite3.connect(self.sqlite_path, check_same_thread=False, timeout=5, isolation_level=None)
+        if self.sqlite_path != ":memory:":
+            conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                id TEXT PRIMARY KEY,
+                supplier_id TEXT NOT NULL,
+                pdf_path TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                run_after REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_ingestion_jobs_status ON ingestion_jobs (status, run_after)"
+        )
+        self._conn, self._conn_pid = conn, os.getpid()
+        return conn
+
+    def _requeue_stale(self):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            cur = conn.execute(
+                "UPDATE ingestion_jobs SET status = ?, updated_at = ? WHERE status = ? AND updated_at < ?",
+                (QUEUED, now, RUNNING, now - self.stale_after),
+            )
+        if cur.rowcount:
+            log_warning("IngestionJobsRequeued", f"{cur.rowcount} stale running job(s)")
+
+    def _claim(self):
+        """
+        Atomically move the oldest runnable job to 'running'. Jobs of a
+        supplier that already has a running job are skipped for now.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    f"""
+                    SELECT {', '.join(_COLUMNS)} FROM ingestion_jobs
+                    WHERE status = ? AND run_after <= ?
+                      AND supplier_id NOT IN (SELECT supplier_id FROM ingestion_jobs WHERE status = ?)
+                    ORDER BY created_at LIMIT 1
+                    """,
+                    (QUEUED, now, RUNNING),
+                ).fetchone()
+                if row:
+                    conn.execute(
+                        "UPDATE ingestion_jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                        (RUNNING, now, row[0]),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if not row:
+            return None
+        job = _job_dict(row, include_path=True)
+        job["status"] = RUNNING
+        job["attempts"] += 1
+        return job
+
+    def _finish(self, job, status, result=None, error=None, run_after=0.0):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "UPDATE ingestion_jobs SET status = ?, result = ?, error = ?, run_after = ?, updated_at = ? WHERE id = ?",
+                (status, result, error, run_after, time.time(), job["id"]),
+            )
+        if status in (SUCCEEDED, FAILED):
+            _remove_file(job["pdf_path"])
+        # the supplier's next job (if any) may be runnable now
+        self._wakeup.set()
+
+    def _run(self, job):
+        started = time.perf_counter()
+        try:
+            result = self.handler(job, self.embedding_slots)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if job["attempts"] < self.max_attempts:
+                delay = self.retry_backoff * (2 ** (job["attempts"] - 1))
+                log_warning("IngestionJobRetry", f"{job['id']} attempt {job['attempts']} failed ({error}); retry in {delay}s")
+                self._finish(job, QUEUED, error=error, run_after=time.time() + delay)
+            else:
+                log_error("IngestionJobFailed", f"{job['id']} after {job['attempts']} attempts: {error}")
+                self._finish(job, FAILED, error=error)
+            return
+        log_info("IngestionJobDone", f"{job['id']} in {time.perf_counter() - started:.2f}s")
+        self._finish(job, SUCCEEDED, result=None if result is None else str(result))
+
+    def _work(self):
+        while not self._stopping.is_set():
+            job = self._claim()
+            if job is None:
+                # nothing runnable: sleep until a submit/finish, or poll for
+                # retries and jobs queued by other processes
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._run(job)
+
+
+def _job_dict(row, include_path=False) -> dict:
+    job = dict(zip(_COLUMNS, row))
+    if not include_path:
+        # server-side temp path; not for API responses
+        del job["pdf_path"]
+    return job
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        log_warning("IngestionFileCleanup", f"{path}: {str(e)}")
@@ -0,0 +1,223 @@
+"""
+Maintenance commands for the backend.
+
+    python manage.py rebuild-ratings    # recompute supplier rating summaries from reviews
+    python manage.py migrate            # apply pending schema migrations (see migrations.py)
+    python manage.py explain-indexes    # query plans of the hot lookups without / with their indexes
+    python manage.py build-vector-index # rebuild the local vector index (VECTOR_STORE=local) from Mongo
+    python manage.py bench-merge        # time the search result merge on synthetic hits
+"""
+import argparse
+import json
+
+from sqlalchemy import text
+
+import repository
+from database import SessionLocal, Base, engine
+from migrations import HOT_LOOKUP_INDEXES, run_migrations
+
+
+def rebuild_ratings(args):
+    # make sure the summaries table exists on databases created before it
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        count = repository.rebuild_supplier_rating_summaries(db)
+        print(f"Rebuilt rating summaries for {count} suppliers")
+    finally:
+        db.close()
+
+
+def migrate(args):
+    applied = run_migrations(engine)
+    print(f"Applied migrations: {applied}" if applied else "Database is up to date")
+
+
+# (label, query, params) for the hot lookups covered by HOT_LOOKUP_INDEXES.
+# Ratings are read from supplier_rating_summaries by primary key, so the
+# reviews index has no hot lookup left to measure.
+_HOT_QUERIES = [
+    ("login (users.username)", "SELECT * FROM users WHERE username = :v", "bench_user_42"),
+    ("routing (services.name)", "SELECT * FROM services WHERE name = :v", "bench-service-42"),
+    ("posts by requester", "SELECT * FROM posts WHERE requester_id = :v", "bench-u-42"),
+    ("bids for post", "SELECT * FROM bids WHERE post_id = :v", "bench-p-42"),
+    ("messages sent", "SELECT * FROM messages WHERE sender_id = :v", "bench-u-42"),
+    ("messages received", "SELECT * FROM messages WHERE receiver_id = :v", "bench-u-42"),
+    ("suppliers for service", "SELECT supplier_id FROM supplier_services WHERE service_id = :v", "bench-s-42"),
+]
+
+_SEED_SQL = [
+    "INSERT INTO users (id, username, is_supplier) "
+    "SELECT 'bench-u-' || g, 'bench_user_' || g, true FROM generate_series(1, :n) g",
+    "INSERT INTO services (id, name) "
+    "SELECT 'bench-s-' || g, 'bench-service-' || g FROM generate_series(1, :n / 10) g",
+    "INSERT INTO supplier_services (supplier_id, service_id) "
+    "SELECT 'bench-u-' || g, 'bench-s-' || (g % (:n / 10) + 1) FROM generate_series(1, :n) g",
+    "INSERT INTO posts (id, title, requester_id) "
+    "SELECT 'bench-p-' || g, 'bench post', 'bench-u-' || (g % :n + 1) FROM generate_series(1, :n) g",
+    "INSERT INTO bids (id, post_id, supplier_id, price) "
+    "SELECT 'bench-b-' || g, 'bench-p-' || (g % :n + 1), 'bench-u-' || ((g * 7) % :n + 1), 10 FROM generate_series(1, :n) g",
+    "INSERT INTO messages (id, sender_id, receiver_id, content) "
+    "SELECT 'bench-m-' || g, 'bench-u-' || (g % :n + 1), 'bench-u-' || ((g * 3) % :n + 1), 'hi' FROM generate_series(1, :n) g",
+]
+
+
+def _scan_types(plan: dict) -> list:
+    """
+    Leaf scan node types of an EXPLAIN (FORMAT JSON) plan, e.g. ['Seq Scan'].
+    """
+    children = plan.get("Plans") or []
+    if not children:
+        return [plan["Node Type"]]
+    return [t for child in children for t in _scan_types(child)]
+
+
+def _explain(conn, sql: str, value: str):
+    raw = conn.execute(text("EXPLAIN (ANALYZE, FORMAT JSON) " + sql), {"v": value}).scalar()
+    result = (json.loads(raw) if isinstance(raw, str) else raw)[0]
+    return ", ".join(_scan_types(result["Plan"])), result["Execution Time"]
+
+
+def explain_indexes(args):
+    """
+    Seed synthetic rows, then EXPLAIN ANALYZE every hot lookup without and
+    with its index. Runs in one transaction that is rolled back, so neither
+    the rows nor the index drops/creates survive -- but the DROP INDEX locks
+    the tables meanwhile, so don't point this at production.
+    """
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("explain-indexes needs Postgres (EXPLAIN ANALYZE, FORMAT JSON)")
+
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            for sql in _SEED_SQL:
+                conn.execute(text(sql), {"n": args.rows})
+
+            for name, _, _, _ in HOT_LOOKUP_INDEXES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            conn.execute(text("ANALYZE"))
+            before = [_explain(conn, sql, value) for _, sql, value in _HOT_QUERIES]
+
+            for name, table, column, _ in HOT_LOOKUP_INDEXES:
+                conn.execute(text(f"CREATE INDEX {name} ON {table} ({column})"))
+            conn.execute(text("ANALYZE"))
+            after = [_explain(conn, sql, value) for _, sql, value in _HOT_QUERIES]
+        finally:
+            trans.rollback()
+
+    print(f"{'query':<26} {'without index':<36} {'with index':<36}")
+    for (label, _, _), (plan_b, ms_b), (plan_a, ms_a) in zip(_HOT_QUERIES, before, after):
+        print(f"{label:<26} {plan_b + f' ({ms_b:.2f} ms)':<36} {plan_a + f' ({ms_a:.2f} ms)':<36}")
+
+
+def build_vector_index(args):
+    """
+    Rebuild the local vector index from the active chunks in Mongo and save
+    it where the server opens it (VECTOR_INDEX_PATH). Stop the server first:
+    it saves its own copy of the index at shutdown.
+    """
+    import os
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+    from config import vector_index_path, vector_index_type, vector_ann_threshold, hnsw_m, hnsw_ef_construction, hnsw_ef
+    from pipeline.vector_store import LocalVectorStore
+
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    try:
+        store = LocalVectorStore(
+            path=args.path or vector_index_path,
+            index_type=vector_index_type,
+            ann_threshold=vector_ann_threshold,
+            hnsw_m=hnsw_m,
+            hnsw_ef_construction=hnsw_ef_construction,
+            hnsw_ef=hnsw_ef,
+        )
+        store.build_from_collection(client["testdb"]["chunks"])
+        store.save()
+    finally:
+        client.close()
+    print(f"Saved vector index to {store.path}: {store.stats()}")
+
+
+def _merge_by_sorting(hits, valid_supplier_ids, top_k):
+    """
+    Reference merge: materialized filter, dict dedup, full sort.
+    """
+    filtered = [h for h in hits if h.get("supplier_id") in valid_supplier_ids]
+    best = {}
+    for h in filtered:
+        sup = h["supplier_id"]
+        if sup not in best or h["score"] > best[sup]["score"]:
+            best[sup] = h
+    return sorted(best.values(), key=lambda h: h["score"], reverse=True)[:top_k]
+
+
+def bench_merge(args):
+    """
+    Time merge_supplier_hits against the sort-based reference on synthetic
+    candidate lists (random suppliers and scores, a fraction of suppliers
+    offering the routed service) and check both pick the same suppliers.
+    """
+    import random
+    import time
+    from pipeline.enhance_rag_pipeline import merge_supplier_hits
+
+    rng = random.Random(args.seed)
+    suppliers = [f"s{i}" for i in range(args.suppliers)]
+    valid = frozenset(rng.sample(suppliers, max(1, int(len(suppliers) * args.valid_fraction))))
+    print(f"{'hits':>8} {'reference (ms)':>15} {'heap merge (ms)':>16} {'speedup':>8}")
+    for n in args.hits:
+        hits = [
+            {"supplier_id": rng.choice(suppliers), "chunk_text": "", "score": rng.random()}
+            for _ in range(n)
+        ]
+        timings = {}
+        for name, merge in (("reference", _merge_by_sorting), ("heap", merge_supplier_hits)):
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                result = merge(hits, valid, args.top_k)
+            timings[name] = (time.perf_counter() - start) / args.repeat * 1000
+            timings[name + "_result"] = [h["supplier_id"] for h in result]
+        if timings["reference_result"] != timings["heap_result"]:
+            raise SystemExit(f"Merge results differ for {n} hits")
+        print(
+            f"{n:>8} {timings['reference']:>15.2f} {timings['heap']:>16.2f} "
+            f"{timings['reference'] / timings['heap']:>7.1f}x"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = subparsers.add_parser("rebuild-ratings", help="Recompute supplier rating summaries from reviews")
+    rebuild.set_defaults(func=rebuild_ratings)
+
+    migrate_cmd = subparsers.add_parser("migrate", help="Apply pending schema migrations")
+    migrate_cmd.set_defaults(func=migrate)
+
+    explain = subparsers.add_parser("explain-indexes", help="Compare hot-lookup query plans without / with indexes")
+    explain.add_argument("--rows", type=int, default=50000, help="synthetic rows per table")
+    explain.set_defaults(func=explain_indexes)
+
+    vector_index = subparsers.add_parser("build-vector-index", help="Rebuild the local vector index from Mongo")
+    vector_index.add_argument("--path", help="index directory (default: VECTOR_INDEX_PATH)")
+    vector_index.set_defaults(func=build_vector_index)
+
+    bench = subparsers.add_parser("bench-merge", help="Benchmark the search result merge on synthetic hits")
+    bench.add_argument("--hits", type=int, nargs="+", default=[10000, 50000, 200000], help="candidate list sizes")
+    bench.add_argument("--suppliers", type=int, default=5000, help="distinct suppliers among the hits")
+    bench.add_argument("--valid-fraction", type=float, default=0.2, help="share of suppliers offering the service")
+    bench.add_argument("--top-k", type=int, default=5)
+    bench.add_argument("--repeat", type=int, default=20)
+    bench.add_argument("--seed", type=int, default=0)
+    bench.set_defaults(func=bench_merge)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
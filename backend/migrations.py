@@ -0,0 +1,135 @@
+"""
+Versioned schema migrations for databases created before a model change.
+
+models.Base.metadata.create_all only creates missing tables, never indexes
+on existing ones, so every change to an existing table goes here as a new
+numbered Migration. Applied versions are recorded in 'schema_migrations'.
+
+Run with:  python manage.py migrate
+"""
+from sqlalchemy import inspect, text
+
+from pipeline.log_util import log_info
+
+# (index name, table, column, unique) for the hot lookup columns.
+# Names match what SQLAlchemy generates for index=True in models.py.
+HOT_LOOKUP_INDEXES = [
+    ("ix_users_username", "users", "username", True),                 # login
+    ("ix_services_name", "services", "name", True),                    # routing
+    ("ix_posts_requester_id", "posts", "requester_id", False),
+    ("ix_bids_post_id", "bids", "post_id", False),
+    ("ix_reviews_supplier_id", "reviews", "supplier_id", False),
+    ("ix_messages_sender_id", "messages", "sender_id", False),
+    ("ix_messages_receiver_id", "messages", "receiver_id", False),
+    ("ix_supplier_services_service_id", "supplier_services", "service_id", False),
+]
+
+
+class Migration:
+    def __init__(self, version: int, description: str, apply):
+        self.version = version
+        self.description = description
+        self.apply = apply  # apply(conn), conn is in autocommit mode
+
+
+def _drop_invalid_index(conn, name: str):
+    """
+    A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind, which
+    IF NOT EXISTS would then silently keep. Drop it so the build is retried.
+    """
+    invalid = conn.execute(
+        text(
+            "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ),
+        {"name": name},
+    ).first()
+    if invalid:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
+def create_hot_lookup_indexes(conn):
+    """
+    Build HOT_LOOKUP_INDEXES. On Postgres the indexes are built CONCURRENTLY,
+    so reads and writes to the tables keep working while they build.
+    """
+    is_postgres = conn.dialect.name == "postgresql"
+    for name, table, column, unique in HOT_LOOKUP_INDEXES:
+        if is_postgres:
+            _drop_invalid_index(conn, name)
+        sql = "CREATE {unique}INDEX {concurrently}IF NOT EXISTS {name} ON {table} ({column})".format(
+            unique="UNIQUE " if unique else "",
+            concurrently="CONCURRENTLY " if is_postgres else "",
+            name=name,
+            table=table,
+            column=column,
+        )
+        try:
+            conn.execute(text(sql))
+        except Exception as e:
+            if is_postgres:
+                _drop_invalid_index(conn, name)
+            if unique:
+                raise RuntimeError(
+                    f"Could not build unique index {name}: {table}.{column} has duplicate values. "
+                    f"Remove the duplicates and re-run the migration."
+                ) from e
+            raise
+        log_info("MigrationIndexReady", name)
+
+
+MIGRATIONS = [
+    Migration(1, "indexes and unique constraints on hot lookup columns", create_hot_lookup_indexes),
+]
+
+
+def run_migrations(engine):
+    """
+    Apply every migration newer than what the database has seen, in order.
+    Returns the list of versions applied.
+    """
+    applied_now = []
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                "version INTEGER PRIMARY KEY, "
+                "description TEXT, "
+                "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+            )
+        )
+        applied = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+        for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+            if migration.version in applied:
+                continue
+            log_info("MigrationStart", f"{migration.version}: {migration.description}")
+            migration.apply(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, description) VALUES (:v, :d)"),
+                {"v": migration.version, "d": migration.description},
+            )
+            applied_now.append(migration.version)
+    return applied_now
+
+
+def check_required_indexes(engine):
+    """
+    Fail fast when a unique index of HOT_LOOKUP_INDEXES is missing: the
+    ingestion's INSERT ... ON CONFLICT (name) needs the one on services.name,
+    and without it every ingestion would fail. Call at server start-up.
+    """
+    inspector = inspect(engine)
+    missing = []
+    for name, table, column, unique in HOT_LOOKUP_INDEXES:
+        if not unique:
+            continue
+        uniques = [i["column_names"] for i in inspector.get_indexes(table) if i["unique"]]
+        uniques += [c["column_names"] for c in inspector.get_unique_constraints(table)]
+        if [column] not in uniques:
+            missing.append(f"{table}.{column}")
+    if missing:
+        raise RuntimeError(
+            f"Missing unique index on {', '.join(missing)}: this database predates "
+            f"migrations.py. Run 'python manage.py migrate' before starting the server."
+        )
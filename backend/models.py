@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, DECIMAL, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, Text, Boolean, DateTime, DECIMAL, ForeignKey
 import database
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
@@ -21,7 +21,7 @@ class User(database.Base):
     __tablename__ = "users"
 
     id = Column(String, primary_key=True)
-    username = Column(String)
+    username = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     email = Column(String)
     experience_description = Column(String)
@@ -65,7 +65,7 @@ class Post(database.Base):
     description = Column(Text, comment='Task description')
     category = Column(String, comment='Auto-categorized task')
     status = Column(String, comment='e.g., open, accepted, completed')
-    requester_id = Column(String, ForeignKey('users.id'), comment='User who created the post')
+    requester_id = Column(String, ForeignKey('users.id'), index=True, comment='User who created the post')
     created_at = Column(DateTime, default=datetime.now)
 
 
@@ -85,7 +85,7 @@ class Bid(database.Base):
     __tablename__ = "bids"
 
     id = Column(String, primary_key=True)
-    post_id = Column(String, ForeignKey('posts.id'), comment='Reference to posts')
+    post_id = Column(String, ForeignKey('posts.id'), index=True, comment='Reference to posts')
     supplier_id = Column(String, ForeignKey('users.id'), comment='User id of supplier making the bid')
     price = Column(DECIMAL, comment='Offered price')
     message = Column(Text, comment='Negotiation message or counter-offer details')
@@ -107,8 +107,8 @@ class Message(database.Base):
     __tablename__ = "messages"
 
     id = Column(String, primary_key=True)
-    sender_id = Column(String, ForeignKey('users.id'), comment='User id of sender')
-    receiver_id = Column(String, ForeignKey('users.id'), comment='User id of receiver')
+    sender_id = Column(String, ForeignKey('users.id'), index=True, comment='User id of sender')
+    receiver_id = Column(String, ForeignKey('users.id'), index=True, comment='User id of receiver')
     content = Column(Text)
     sent_at = Column(DateTime, default=datetime.now)
 
@@ -130,13 +130,36 @@ class Review(database.Base):
 
     id = Column(String, primary_key=True)
     post_id = Column(String, ForeignKey('posts.id'), comment='Reference to completed task')
-    supplier_id = Column(String, ForeignKey('users.id'), comment='User id of supplier being reviewed')
+    supplier_id = Column(String, ForeignKey('users.id'), index=True, comment='User id of supplier being reviewed')
     customer_id = Column(String, ForeignKey('users.id'), comment='User id of customer providing review')
     rating = Column(Integer, comment='Rating value (e.g., 1-5)')
     review = Column(Text)
     created_at = Column(DateTime, default=datetime.now)
 
 
+class SupplierRatingSummary(database.Base):
+    """
+    Materialized rating aggregate per supplier, kept up to date by
+    repository.create_review so reading a rating never scans reviews.
+
+    Attributes:
+        supplier_id (str): Primary key, the supplier (user) being rated.
+        review_count (int): Number of reviews.
+        rating_sum (int): Sum of all review ratings.
+        avg_rating (float): rating_sum / review_count.
+        bayesian_rating (float): Average smoothed towards a prior, so a single 5-star review doesn't outrank many 4.8s.
+        updated_at (datetime): Last time the aggregate changed.
+    """
+    __tablename__ = "supplier_rating_summaries"
+
+    supplier_id = Column(String, ForeignKey('users.id'), primary_key=True)
+    review_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    avg_rating = Column(Float, nullable=False, default=0.0)
+    bayesian_rating = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+
 class Service(database.Base):
     """
     Represents a service that can be offered by a supplier.
@@ -149,7 +172,7 @@ class Service(database.Base):
     __tablename__ = "services"
 
     id = Column(String, primary_key=True)
-    name = Column(String)
+    name = Column(String, unique=True, index=True)
     description = Column(Text)
     
     # Relationship to SupplierService
@@ -167,7 +190,8 @@ class SupplierService(database.Base):
     __tablename__ = "supplier_services"
 
     supplier_id = Column(String, ForeignKey('users.id'), primary_key=True)
-    service_id = Column(String, ForeignKey('services.id'), primary_key=True)
+    # the (supplier_id, service_id) primary key can't serve lookups by service alone
+    service_id = Column(String, ForeignKey('services.id'), primary_key=True, index=True)
     
     supplier = relationship("User", back_populates="services")
     service = relationship("Service", back_populates="suppliers")
@@ -0,0 +1,277 @@
+# pipeline/chunk_store.py
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from pymongo import UpdateOne
+
+from .embedding_utils import batch_embed_texts, iter_batches
+from .log_util import log_info, log_warning
+
+# Completed ingestions: one {supplier_id, doc_hash} marker per supplier, next
+# to the chunks collection.
+DOCUMENTS_COLLECTION = "supplier_documents"
+
+_INDEXED = set()
+_INDEX_LOCK = threading.Lock()
+
+# Serializes a supplier's version writes and garbage collection in this process.
+_SUPPLIER_LOCKS = {}
+_SUPPLIER_LOCKS_LOCK = threading.Lock()
+
+# Old chunk versions are removed off the ingestion path.
+_GC_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chunk-gc")
+
+
+def hash_pdf(pdf_source, block_size=1024 * 1024) -> str:
+    """
+    sha256 of a PDF (path or bytes), read in blocks.
+    """
+    h = hashlib.sha256()
+    if isinstance(pdf_source, (bytes, bytearray, memoryview)):
+        h.update(pdf_source)
+    else:
+        with open(pdf_source, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                h.update(block)
+    return h.hexdigest()
+
+
+def chunk_hash(chunk_text: str) -> str:
+    return hashlib.sha256(chunk_text.encode("utf-8")).hexdigest()
+
+
+def _documents(collection):
+    return collection.database[DOCUMENTS_COLLECTION]
+
+
+def _ensure_indexes(collection):
+    key = (collection.database.name, collection.name)
+    if key in _INDEXED:
+        return
+    with _INDEX_LOCK:
+        if key not in _INDEXED:
+            collection.create_index([("supplier_id", 1), ("chunk_hash", 1)])
+            _documents(collection).create_index("supplier_id", unique=True)
+            _INDEXED.add(key)
+
+
+def get_current_document(collection, supplier_id: str, doc_hash: str):
+    """
+    The supplier's document marker ({doc_hash, num_chunks, updated_at,
+    roles_linked?}) when this exact PDF holds their active chunks, else None.
+    """
+    return _documents(collection).find_one({"supplier_id": supplier_id, "doc_hash": doc_hash}, {"_id": 0})
+
+
+def mark_roles_linked(collection, supplier_id: str, doc_hash: str):
+    """
+    Record that the supplier's services were linked from document doc_hash,
+    the last ingestion step; until then a re-upload of it is not skipped.
+    """
+    _documents(collection).update_one(
+        {"supplier_id": supplier_id, "doc_hash": doc_hash},
+        {"$set": {"roles_linked": True}},
+    )
+
+
+def _supplier_lock(supplier_id: str):
+    with _SUPPLIER_LOCKS_LOCK:
+        lock = _SUPPLIER_LOCKS.get(supplier_id)
+        if lock is None:
+            lock = _SUPPLIER_LOCKS[supplier_id] = threading.Lock()
+        return lock
+
+
+def sync_supplier_chunks(model, collection, supplier_id, doc_hash, chunks, batch_size=64, embedding_slots=None):
+    """
+    Write `chunks` (an iterable of texts) as version doc_hash of the
+    supplier's chunks, embedding only texts that aren't stored yet:
+
+      - new chunk texts are embedded and upserted, keyed by (supplier_id, chunk_hash)
+      - chunks already stored are shared: doc_hash is added to their versions
+      - only after every chunk is written does the supplier's document marker
+        switch its active version to doc_hash
+      - older versions are garbage-collected afterwards, in the background
+
+    Search only returns chunks of the active version (drop_inactive_chunks),
+    so it never sees a half-written version, and a failed run leaves the
+    previous version in place; its partial chunks are collected by the next
+    successful run.
+
+    Returns {"chunks", "embedded", "unchanged"}.
+    """
+    _ensure_indexes(collection)
+    with _supplier_lock(supplier_id):
+        stored = set(collection.distinct("chunk_hash", {"supplier_id": supplier_id}))
+        old_versions = set(collection.distinct("versions", {"supplier_id": supplier_id})) - {doc_hash}
+        seen = set()
+        embedded = unchanged = total = 0
+        for batch in iter_batches(chunks, batch_size):
+            fresh, kept = [], []
+            for text in batch:
+                h = chunk_hash(text)
+                total += 1
+                if h in seen:
+                    # repeated text within the document: stored once
+                    continue
+                seen.add(h)
+                (kept if h in stored else fresh).append((h, text))
+
+            if kept:
+                hashes = [h for h, _ in kept]
+                matched = collection.update_many(
+                    {"supplier_id": supplier_id, "chunk_hash": {"$in": hashes}},
+                    {"$addToSet": {"versions": doc_hash}},
+                ).matched_count
+                if matched < len(kept):
+                    # collected since `stored` was read (GC of another
+                    # worker's ingestion): write them like new chunks
+                    present = set(collection.distinct(
+                        "chunk_hash", {"supplier_id": supplier_id, "chunk_hash": {"$in": hashes}}
+                    ))
+                    fresh.extend((h, text) for h, text in kept if h not in present)
+                    kept = [(h, text) for h, text in kept if h in present]
+                unchanged += len(kept)
+            if fresh:
+                with embedding_slots or nullcontext():
+                    embs = batch_embed_texts(model, [text for _, text in fresh], batch_size=16)
+                collection.bulk_write([
+                    UpdateOne(
+                        {"supplier_id": supplier_id, "chunk_hash": h},
+                        {
+                            "$set": {"chunk_text": text, "embedding": emb.tolist()},
+                            "$addToSet": {"versions": doc_hash},
+                        },
+                        upsert=True,
+                    )
+                    for (h, text), emb in zip(fresh, embs)
+                ], ordered=False)
+                embedded += len(fresh)
+
+        # every chunk of the new version is in: switch the active version
+        _documents(collection).update_one(
+            {"supplier_id": supplier_id},
+            {
+                "$set": {"doc_hash": doc_hash, "num_chunks": total, "updated_at": time.time()},
+                # roles of the new version aren't linked yet (mark_roles_linked)
+                "$unset": {"roles_linked": ""},
+            },
+            upsert=True,
+        )
+    _GC_EXECUTOR.submit(_collect_quietly, collection, supplier_id, old_versions)
+    stats = {"chunks": total, "embedded": embedded, "unchanged": unchanged}
+    log_info("SupplierChunksSynced", f"{supplier_id}: {stats}")
+    return stats
+
+
+def collect_old_versions(collection, supplier_id: str, old_versions) -> int:
+    """
+    Remove old_versions from the supplier's chunks and delete chunks that
+    no version uses any more (and unversioned chunks from before versioning).
+    The active version is re-read first and never collected, in case the
+    same document was re-activated in the meantime. Returns chunks deleted.
+    """
+    with _supplier_lock(supplier_id):
+        marker = _documents(collection).find_one({"supplier_id": supplier_id})
+        if not marker:
+            return 0
+        old = [v for v in old_versions if v != marker["doc_hash"]]
+        if old:
+            collection.update_many(
+                {"supplier_id": supplier_id, "versions": {"$in": old}},
+                {"$pull": {"versions": {"$in": old}}},
+            )
+        removed = collection.delete_many({
+            "supplier_id": supplier_id,
+            "$or": [{"versions": {"$size": 0}}, {"versions": {"$exists": False}}],
+        }).deleted_count
+    if removed:
+        log_info("SupplierChunksCollected", f"{supplier_id}: {removed} chunk(s) of old versions")
+    return removed
+
+
+def _collect_quietly(collection, supplier_id, old_versions):
+    try:
+        return collect_old_versions(collection, supplier_id, old_versions)
+    except Exception as e:
+        # harmless: inactive chunks are filtered out of search, and the next
+        # ingestion for this supplier collects them again
+        log_warning("SupplierChunksCollectFailed", f"{supplier_id}: {str(e)}")
+
+
+def _active_versions_query(supplier_ids):
+    query = {} if supplier_ids is None else {"supplier_id": {"$in": list(supplier_ids)}}
+    return query, {"_id": 0, "supplier_id": 1, "doc_hash": 1}
+
+
+def active_versions(collection, supplier_ids=None) -> dict:
+    """
+    supplier_id -> active version (doc_hash), for suppliers with a marker;
+    supplier_ids=None reads every supplier's.
+    """
+    if supplier_ids is not None and not supplier_ids:
+        return {}
+    query, projection = _active_versions_query(supplier_ids)
+    return {d["supplier_id"]: d["doc_hash"] for d in _documents(collection).find(query, projection)}
+
+
+async def active_versions_async(collection, supplier_ids) -> dict:
+    """
+    active_versions for an AsyncMongoClient collection.
+    """
+    if not supplier_ids:
+        return {}
+    query, projection = _active_versions_query(supplier_ids)
+    docs = await _documents(collection).find(query, projection).to_list(None)
+    return {d["supplier_id"]: d["doc_hash"] for d in docs}
+
+
+def iter_active_chunks(collection, supplier_id=None, versions_by_supplier=None):
+    """
+    Stored chunks with their embeddings, of the active version only (the
+    same visibility as drop_inactive_chunks), for one supplier or all.
+    versions_by_supplier: active versions already read with active_versions.
+    """
+    query = {} if supplier_id is None else {"supplier_id": supplier_id}
+    markers = versions_by_supplier
+    if markers is None:
+        markers = active_versions(collection, None if supplier_id is None else [supplier_id])
+    projection = {"_id": 0, "supplier_id": 1, "chunk_text": 1, "embedding": 1, "versions": 1}
+    for doc in collection.find(query, projection):
+        active = markers.get(doc.get("supplier_id"))
+        versions = doc.get("versions")
+        if (active in versions) if versions else active is None:
+            yield doc
+
+
+def unversioned_chunk_counts(collection) -> dict:
+    """
+    supplier_id -> number of unversioned chunks (ingested before versioning).
+    """
+    docs = collection.aggregate([
+        {"$match": {"versions": {"$exists": False}}},
+        {"$group": {"_id": "$supplier_id", "count": {"$sum": 1}}},
+    ])
+    return {d["_id"]: d["count"] for d in docs}
+
+
+def drop_inactive_chunks(docs, versions_by_supplier: dict):
+    """
+    Keep search hits that belong to their supplier's active version and
+    strip the versions field. Until a supplier has an active version, only
+    their unversioned chunks (ingested before versioning) are visible.
+    """
+    visible = []
+    for doc in docs:
+        versions = doc.pop("versions", None)
+        active = versions_by_supplier.get(doc.get("supplier_id"))
+        if versions:
+            keep = active in versions
+        else:
+            keep = active is None
+        if keep:
+            visible.append(doc)
+    return visible
@@ -1,33 +1,199 @@
 # pipeline/chunking_utils.py
 import fitz  # PyMuPDF
 import re
+import threading
+from collections import deque
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import nltk
 nltk.download("punkt", quiet=True)
 from nltk.tokenize import sent_tokenize
 
-def read_and_chunk_pdf_adaptive(pdf_path, max_words=150):
-    doc = fitz.open(pdf_path)
+from .log_util import log_info, log_warning
+
+# Parallel page extraction (see configure_pdf_extraction). One worker means
+# every PDF is chunked sequentially in the calling thread.
+_EXTRACT_WORKERS = 1
+_PARALLEL_MIN_PAGES = 8
+_PAGES_PER_TASK = 16
+_EXTRACT_POOL = None
+_EXTRACT_POOL_LOCK = threading.Lock()
+
+
+def configure_pdf_extraction(workers=1, min_pages=8):
+    """
+    Spread the pages of PDFs with at least min_pages pages over a pool of
+    `workers` processes. Smaller documents aren't worth the hand-off and
+    stay sequential. The pool is started on first use.
+    """
+    global _EXTRACT_WORKERS, _PARALLEL_MIN_PAGES, _EXTRACT_POOL
+    with _EXTRACT_POOL_LOCK:
+        if _EXTRACT_POOL is not None:
+            _EXTRACT_POOL.shutdown(wait=False)
+            _EXTRACT_POOL = None
+        _EXTRACT_WORKERS = max(1, workers)
+        _PARALLEL_MIN_PAGES = max(2, min_pages)
+    log_info("PdfExtractionConfigured", f"workers={_EXTRACT_WORKERS}, min_pages={_PARALLEL_MIN_PAGES}")
+
+
+def _get_extract_pool():
+    global _EXTRACT_POOL
+    with _EXTRACT_POOL_LOCK:
+        if _EXTRACT_POOL is None:
+            # spawn, not fork: ingestion runs in worker threads, and forking a
+            # threaded process (model, DB pools) can deadlock the child
+            _EXTRACT_POOL = ProcessPoolExecutor(
+                max_workers=_EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _EXTRACT_POOL
+
+
+def open_pdf(pdf_source):
+    """
+    Open a PDF from a file path, or from bytes already in memory.
+    From a path MuPDF reads pages from the file as needed, so the document
+    is never loaded into memory as a whole.
+    """
+    if isinstance(pdf_source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=bytes(pdf_source), filetype="pdf")
+    return fitz.open(pdf_source)
+
+
+def _chunk_page_text(text, max_words):
+    # Chunks never span pages, so pages can be chunked independently.
     chunks = []
-    for page in doc:
-        text = page.get_text()
-        text = re.sub(r"\s+", " ", text).strip()
-        sentences = sent_tokenize(text)
-        current_chunk = []
-        current_len = 0
-        for sent in sentences:
-            word_count = len(sent.split())
-            if current_len + word_count > max_words and current_chunk:
-                chunk_text = " ".join(current_chunk)
-                if len(chunk_text) > 30:
-                    chunks.append(chunk_text)
-                current_chunk = [sent]
-                current_len = word_count
-            else:
-                current_chunk.append(sent)
-                current_len += word_count
-        if current_chunk:
+    text = re.sub(r"\s+", " ", text).strip()
+    sentences = sent_tokenize(text)
+    current_chunk = []
+    current_len = 0
+    for sent in sentences:
+        word_count = len(sent.split())
+        if current_len + word_count > max_words and current_chunk:
             chunk_text = " ".join(current_chunk)
             if len(chunk_text) > 30:
                 chunks.append(chunk_text)
-    doc.close()
+            current_chunk = [sent]
+            current_len = word_count
+        else:
+            current_chunk.append(sent)
+            current_len += word_count
+    if current_chunk:
+        chunk_text = " ".join(current_chunk)
+        if len(chunk_text) > 30:
+            chunks.append(chunk_text)
     return chunks
+
+
+def _chunk_page_range(pdf_source, start, stop, max_words):
+    """
+    Process-pool task: chunks of pages [start, stop), in page order.
+    """
+    return list(_iter_page_range(pdf_source, start, stop, max_words))
+
+
+def _page_ranges(page_count, parts):
+    # contiguous, near-equal ranges, so merging them in order keeps page order
+    size, extra = divmod(page_count, parts)
+    start = 0
+    for i in range(parts):
+        stop = start + size + (1 if i < extra else 0)
+        if stop > start:
+            yield start, stop
+        start = stop
+
+
+def _iter_chunks_parallel(pdf_source, page_count, max_words):
+    """
+    Chunks of the page ranges, in page order, with at most two ranges per
+    worker in flight, so finished-but-unconsumed results stay bounded.
+    If the pool breaks, the rest of the document is chunked sequentially.
+    """
+    # small ranges keep each result small; at least a few per worker even out
+    # pages of very different lengths
+    parts = max(_EXTRACT_WORKERS * 2, -(-page_count // _PAGES_PER_TASK))
+    window = _EXTRACT_WORKERS * 2
+    pool = _get_extract_pool()
+    pending = deque()
+    try:
+        for start, stop in _page_ranges(page_count, min(parts, page_count)):
+            try:
+                future = pool.submit(_chunk_page_range, pdf_source, start, stop, max_words)
+            except BrokenProcessPool as e:
+                # nothing from `pending` has been yielded yet: resume from its first range
+                resume_at = pending[0][0] if pending else start
+                _drop_broken_pool(e, pending)
+                yield from _iter_page_range(pdf_source, resume_at, page_count, max_words)
+                return
+            pending.append((start, future))
+            if len(pending) >= window:
+                chunks, fell_back = _range_result(pending, pdf_source, page_count, max_words)
+                yield from chunks
+                if fell_back:
+                    return
+        while pending:
+            chunks, fell_back = _range_result(pending, pdf_source, page_count, max_words)
+            yield from chunks
+            if fell_back:
+                return
+    finally:
+        # consumer stopped early: don't keep extracting pages nobody reads
+        for _, future in pending:
+            future.cancel()
+
+
+def _drop_broken_pool(error, pending):
+    # a crashed worker breaks the pool for good: start a new one next time
+    global _EXTRACT_POOL
+    with _EXTRACT_POOL_LOCK:
+        _EXTRACT_POOL = None
+    log_warning("PdfExtractionPoolBroken", f"falling back to sequential: {str(error)}")
+    for _, other in pending:
+        other.cancel()
+    pending.clear()
+
+
+def _range_result(pending, pdf_source, page_count, max_words):
+    """
+    (chunks of the next pending range, fell_back). On a broken pool the
+    chunks are a sequential pass over the rest of the document, from this
+    range on, and fell_back is True: the caller must stop submitting.
+    """
+    start, future = pending.popleft()
+    try:
+        return future.result(), False
+    except BrokenProcessPool as e:
+        _drop_broken_pool(e, pending)
+        return _iter_page_range(pdf_source, start, page_count, max_words), True
+
+
+def _iter_page_range(pdf_source, start, stop, max_words):
+    doc = open_pdf(pdf_source)
+    try:
+        for page_no in range(start, stop):
+            yield from _chunk_page_text(doc[page_no].get_text(), max_words)
+    finally:
+        doc.close()
+
+
+def iter_pdf_chunks(pdf_path, max_words=150):
+    """
+    Yield the chunks of a PDF (path or bytes) page by page, so callers can
+    embed and store them in batches without holding the whole document's
+    chunks. Same chunks, in the same order, as read_and_chunk_pdf_adaptive.
+    """
+    doc = open_pdf(pdf_path)
+    try:
+        page_count = doc.page_count
+        if _EXTRACT_WORKERS <= 1 or page_count < _PARALLEL_MIN_PAGES:
+            for page in doc:
+                yield from _chunk_page_text(page.get_text(), max_words)
+            return
+    finally:
+        doc.close()
+    yield from _iter_chunks_parallel(pdf_path, page_count, max_words)
+
+
+def read_and_chunk_pdf_adaptive(pdf_path, max_words=150):
+    # pdf_path: path or PDF bytes
+    return list(iter_pdf_chunks(pdf_path, max_words))
@@ -1,8 +1,130 @@
 # pipeline/embedding_utils.py
+import os
+import threading
+import time
+
+import numpy as np
 from sentence_transformers import SentenceTransformer
 
-def get_embedding_model():
-    return SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+from .cache_utils import normalize_query_key
+from .log_util import log_info
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Process-wide registry: model_name -> loaded SentenceTransformer.
+# Loading the same model twice in one process only wastes RAM and start-up time,
+# so every pipeline shares the instance stored here.
+_MODEL_REGISTRY = {}
+_MODEL_STATS = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _current_rss_mb():
+    """
+    Resident set size of this process in MB, or None if psutil is unavailable.
+    """
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def get_embedding_model(model_name: str = DEFAULT_EMBEDDING_MODEL):
+    """
+    Return the shared SentenceTransformer for model_name, loading it on first use.
+    """
+    model = _MODEL_REGISTRY.get(model_name)
+    if model is not None:
+        return model
+
+    with _REGISTRY_LOCK:
+        # another thread may have finished loading while we waited on the lock
+        model = _MODEL_REGISTRY.get(model_name)
+        if model is not None:
+            return model
+
+        rss_before = _current_rss_mb()
+        start = time.perf_counter()
+        model = SentenceTransformer(model_name)
+        load_seconds = time.perf_counter() - start
+        rss_after = _current_rss_mb()
+
+        _MODEL_REGISTRY[model_name] = model
+        _MODEL_STATS[model_name] = {
+            "load_seconds": round(load_seconds, 3),
+            "rss_mb_before": round(rss_before, 1) if rss_before is not None else None,
+            "rss_mb_after": round(rss_after, 1) if rss_after is not None else None,
+            "pid": os.getpid(),
+        }
+        log_info("EmbeddingModelLoaded", f"{model_name}: {_MODEL_STATS[model_name]}")
+        return model
+
+
+def preload_embedding_models(model_names=None):
+    """
+    Warm start: load the given models (default model if None) into the registry.
+    Call this before the server forks its workers so the weights are shared
+    copy-on-write instead of being loaded again by every worker.
+    """
+    for name in model_names or [DEFAULT_EMBEDDING_MODEL]:
+        get_embedding_model(name)
+    return get_model_registry_stats()
+
+
+def get_model_registry_stats():
+    """
+    Load time / memory info for every model loaded in this process,
+    plus the current resident memory.
+    """
+    return {
+        "pid": os.getpid(),
+        "rss_mb": _current_rss_mb(),
+        "models": {name: dict(stats) for name, stats in _MODEL_STATS.items()},
+    }
+
+
+def encode_queries(model, texts, batch_size=32):
+    """
+    Embed several query texts in one batched encode call.
+    Returns a (len(texts), dim) float32 matrix of L2-normalized rows.
+    """
+    if not texts:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    embs = model.encode(
+        list(texts),
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+    )
+    return np.asarray(embs, dtype=np.float32)
+
+
+def encode_queries_cached(model, texts, cache=None, batch_size=32):
+    """
+    Like encode_queries, but rows for texts already in `cache` (a TTLLRUCache
+    keyed by normalized query text) are reused; only the misses go through
+    the model, still as a single batch.
+    """
+    if cache is None:
+        return encode_queries(model, texts, batch_size=batch_size)
+    keys = [normalize_query_key(t) for t in texts]
+    rows = [cache.get(k) for k in keys]
+
+    missing_keys = list(dict.fromkeys(k for k, row in zip(keys, rows) if row is None))
+    if missing_keys:
+        new_embs = encode_queries(model, missing_keys, batch_size=batch_size)
+        fresh = {}
+        for k, emb in zip(missing_keys, new_embs):
+            emb.setflags(write=False)
+            cache.set(k, emb)
+            fresh[k] = emb
+        rows = [row if row is not None else fresh[k] for k, row in zip(keys, rows)]
+
+    if not rows:
+        return encode_queries(model, [], batch_size=batch_size)
+    return np.stack(rows)
+
 
 def batch_embed_texts(model, texts, batch_size=16):
     all_embs = []
@@ -11,3 +133,18 @@ def batch_embed_texts(model, texts, batch_size=16):
         embs = model.encode(batch)
         all_embs.extend(embs)
     return all_embs
+
+
+def iter_batches(items, batch_size):
+    """
+    Lists of up to batch_size items from any iterable (e.g. a chunk generator).
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
@@ -1,14 +1,48 @@
 # pipeline/enhanced_rag_pipeline.py
+import asyncio
+import heapq
 import openai
 from typing import List
+from pymongo import AsyncMongoClient
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
 import numpy as np
 
-from .embedding_utils import get_embedding_model
+from .embedding_utils import get_embedding_model, encode_queries_cached
+from .cache_utils import TTLLRUCache
+from .llm_cache import cached_chat_completion, cached_chat_completion_async
+from .stage_graph import StageGraph
+from .chunk_store import active_versions, active_versions_async, drop_inactive_chunks
+from .vector_store import AtlasVectorStore
 from .log_util import log_info, log_error, log_event
 
 # =============== OLD CODE: generate_multi_queries + decompose_query ===============
+def _multi_query_messages(user_query, num_queries):
+    prompt = f"""
+        You are an AI assistant. Given the user's query:
+        "{user_query}"
+
+        Generate {num_queries} alternative search queries or rephrasings
+        that might retrieve relevant but slightly different results. 
+        Separate each query by a newline.
+        """
+    return [
+        {"role": "system", "content": "You are a helpful query rewriter."},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _split_lines(content):
+    return [l.strip() for l in content.strip().split("\n") if l.strip()]
+
+
+def _log_multi_queries(user_query, multi_queries, log_event_fn):
+    if log_event_fn:
+        log_event_fn("MultiQueryGenerated", {"original_query": user_query, "queries": multi_queries})
+    else:
+        log_info("MultiQueryGenerated", f"Original: {user_query}, Queries: {multi_queries}")
+
+
 def generate_multi_queries(user_query, num_queries=3, openai_api_key=None, log_event_fn=None):
     """
     Use OpenAI or any LLM to generate multiple variants of the user query.
@@ -17,73 +51,80 @@ def generate_multi_queries(user_query, num_queries=3, openai_api_key=None, log_e
         return [user_query]
 
     try:
-        openai.api_key = openai_api_key
-        client = openai.Client(api_key=openai_api_key)
-
-
-        prompt = f"""
-        You are an AI assistant. Given the user's query:
-        "{user_query}"
-
-        Generate {num_queries} alternative search queries or rephrasings
-        that might retrieve relevant but slightly different results. 
-        Separate each query by a newline.
-        """
-        response = client.chat.completions.create(
+        content = cached_chat_completion(
+            "generate_multi_queries",
+            openai_api_key,
             model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful query rewriter."},
-                {"role": "user", "content": prompt},
-            ],
+            messages=_multi_query_messages(user_query, num_queries),
             temperature=0.8,
         )
-        multi_queries_raw = response.choices[0].message.content.strip().split("\n")
-        multi_queries = [q.strip() for q in multi_queries_raw if q.strip()]
-
-        if log_event_fn:
-            log_event_fn("MultiQueryGenerated", {"original_query": user_query, "queries": multi_queries})
-        else:
-            log_info("MultiQueryGenerated", f"Original: {user_query}, Queries: {multi_queries}")
-
+        multi_queries = _split_lines(content)
+        _log_multi_queries(user_query, multi_queries, log_event_fn)
         return multi_queries
     except Exception as e:
         log_error("UnexpectedError", f"generate_multi_queries: {str(e)}")
         return [user_query]
 
 
-def decompose_query(user_query, openai_api_key=None, log_event_fn=None):
+async def generate_multi_queries_async(user_query, num_queries=3, openai_api_key=None, log_event_fn=None):
     """
-    Break a complex user query into sub-queries.
+    Async version of generate_multi_queries (same prompt, same cache).
     """
     if not openai_api_key:
         return [user_query]
 
+    try:
+        content = await cached_chat_completion_async(
+            "generate_multi_queries",
+            openai_api_key,
+            model="gpt-3.5-turbo",
+            messages=_multi_query_messages(user_query, num_queries),
+            temperature=0.8,
+        )
+        multi_queries = _split_lines(content)
+        _log_multi_queries(user_query, multi_queries, log_event_fn)
+        return multi_queries
+    except Exception as e:
+        log_error("UnexpectedError", f"generate_multi_queries_async: {str(e)}")
+        return [user_query]
+
+
+def _decomposition_messages(user_query):
     decomposition_prompt = f"""
     You are a helpful assistant. 
     The user query is: '{user_query}'
     Break this query into 2-4 smaller sub-queries or aspects, each focusing on a distinct requirement.
     Return them each on a separate line.
     """
-    try:
-        openai.api_key = openai_api_key
-        client = openai.Client(api_key=openai_api_key)
+    return [{"role": "user", "content": decomposition_prompt}]
 
 
-        resp = client.chat.completions.create(
+def _log_sub_queries(user_query, sub_queries, log_event_fn):
+    if log_event_fn:
+        log_event_fn("QueryDecomposed", {"original_query": user_query, "sub_queries": sub_queries})
+    else:
+        log_info("QueryDecomposed", f"Original: {user_query}, Sub-queries: {sub_queries}")
+
+
+def decompose_query(user_query, openai_api_key=None, log_event_fn=None):
+    """
+    Break a complex user query into sub-queries.
+    """
+    if not openai_api_key:
+        return [user_query]
+
+    try:
+        content = cached_chat_completion(
+            "decompose_query",
+            openai_api_key,
             model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": decomposition_prompt}],
+            messages=_decomposition_messages(user_query),
             temperature=0.7
         )
-        lines = resp.choices[0].message.content.strip().split("\n")
-        sub_queries = [l.strip() for l in lines if l.strip()]
-
-        if log_event_fn:
-            log_event_fn("QueryDecomposed", {"original_query": user_query, "sub_queries": sub_queries})
-        else:
-            log_info("QueryDecomposed", f"Original: {user_query}, Sub-queries: {sub_queries}")
-
+        sub_queries = _split_lines(content)
+        _log_sub_queries(user_query, sub_queries, log_event_fn)
         return sub_queries
-    except openai.error.OpenAIError as e:
+    except openai.OpenAIError as e:
         log_error("OpenAIError", f"decompose_query: {str(e)}")
         return [user_query]
     except Exception as e:
@@ -91,45 +132,72 @@ def decompose_query(user_query, openai_api_key=None, log_event_fn=None):
         return [user_query]
 
 
-# =============== LLM-based routing ===============
-def route_query_llm(user_query: str, openai_api_key: str, known_services: List[str]):
+async def decompose_query_async(user_query, openai_api_key=None, log_event_fn=None):
     """
-    LLM-based approach: ask GPT to pick the single best service from known_services, or 'all'.
+    Async version of decompose_query.
     """
-    if not openai_api_key or not known_services:
-        # fallback to 'all'
-        return "all"
+    if not openai_api_key:
+        return [user_query]
 
+    try:
+        content = await cached_chat_completion_async(
+            "decompose_query",
+            openai_api_key,
+            model="gpt-3.5-turbo",
+            messages=_decomposition_messages(user_query),
+            temperature=0.7
+        )
+        sub_queries = _split_lines(content)
+        _log_sub_queries(user_query, sub_queries, log_event_fn)
+        return sub_queries
+    except openai.OpenAIError as e:
+        log_error("OpenAIError", f"decompose_query_async: {str(e)}")
+        return [user_query]
+    except Exception as e:
+        log_error("UnexpectedError", f"decompose_query_async: {str(e)}")
+        return [user_query]
+
+
+# =============== LLM-based routing ===============
+def _routing_messages(user_query, known_services):
     prompt = f"""
     We have these services: {', '.join(known_services)}.
     The user query is: '{user_query}'
     Return exactly one service from that list if it fits well, else 'all'.
     """
+    return [
+        {"role": "system", "content":"You are a role classifier."},
+        {"role":"user","content":prompt}
+    ]
 
-    
-    try:
-        openai.api_key = openai_api_key
-        client = openai.Client(api_key=openai_api_key)
 
-        resp = client.chat.completions.create(
+def _match_service(content, known_services):
+    choice = content.strip().lower()
+    # Attempt to match it to a known service
+    for svc in known_services:
+        if choice == svc.lower():
+            return svc
+    return "all"
+
+
+def route_query_llm(user_query: str, openai_api_key: str, known_services: List[str]):
+    """
+    LLM-based approach: ask GPT to pick the single best service from known_services, or 'all'.
+    """
+    if not openai_api_key or not known_services:
+        # fallback to 'all'
+        return "all"
+
+    try:
+        content = cached_chat_completion(
+            "route_query_llm",
+            openai_api_key,
             model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content":"You are a role classifier."},
-                {"role":"user","content":prompt}
-            ],
+            messages=_routing_messages(user_query, known_services),
             temperature=0
         )
-        choice = resp.choices[0].message.content.strip().lower()
-        # Attempt to match it to a known service
-        match = None
-        for svc in known_services:
-            if choice == svc.lower():
-                match = svc
-                break
-        if not match:
-            match = "all"
-        return match
-    except openai.error.OpenAIError as e:
+        return _match_service(content, known_services)
+    except openai.OpenAIError as e:
         log_error("OpenAIError", f"route_query_llm: {str(e)}")
         return "all"
     except Exception as e:
@@ -137,6 +205,30 @@ def route_query_llm(user_query: str, openai_api_key: str, known_services: List[s
         return "all"
 
 
+async def route_query_llm_async(user_query: str, openai_api_key: str, known_services: List[str]):
+    """
+    Async version of route_query_llm.
+    """
+    if not openai_api_key or not known_services:
+        return "all"
+
+    try:
+        content = await cached_chat_completion_async(
+            "route_query_llm",
+            openai_api_key,
+            model="gpt-3.5-turbo",
+            messages=_routing_messages(user_query, known_services),
+            temperature=0
+        )
+        return _match_service(content, known_services)
+    except openai.OpenAIError as e:
+        log_error("OpenAIError", f"route_query_llm_async: {str(e)}")
+        return "all"
+    except Exception as e:
+        log_error("UnexpectedError", f"route_query_llm_async: {str(e)}")
+        return "all"
+
+
 # =============== LLM-based Re-Rank ===============
 def re_rank_results_llm(user_query: str, results: List[dict], top_k=3, openai_api_key=None):
     """
@@ -184,7 +276,7 @@ def re_rank_results_llm(user_query: str, results: List[dict], top_k=3, openai_ap
         # For simplicity, we fallback right away
         sorted_res = sorted(results, key=lambda x: x["score"], reverse=True)
         return sorted_res[:top_k]
-    except openai.error.OpenAIError as e:
+    except openai.OpenAIError as e:
         log_error("OpenAIError", f"re_rank_results_llm: {str(e)}")
         return sorted(results, key=lambda x: x["score"], reverse=True)[:top_k]
     except Exception as e:
@@ -193,7 +285,42 @@ def re_rank_results_llm(user_query: str, results: List[dict], top_k=3, openai_ap
 
 
 # =============== Structured Output Summaries ===============
-from .structured_output import ask_chatgpt_structured
+from .structured_output import ask_chatgpt_structured, ask_chatgpt_structured_async
+
+
+def _hit_score(hit):
+    return hit["score"]
+
+
+def merge_supplier_hits(hits, valid_supplier_ids=None, top_k=None):
+    """
+    Single pass over `hits` (any iterable of {supplier_id, score, ...}):
+      1) drop hits of suppliers outside valid_supplier_ids (the routed service)
+      2) keep each supplier's best-scoring hit
+      3) return the top_k of those, best first, selected with a heap
+    valid_supplier_ids=None skips the filter; top_k=None keeps every supplier.
+    Memory is one entry per supplier, however many hits stream through.
+    """
+    if valid_supplier_ids is not None and not isinstance(valid_supplier_ids, (set, frozenset)):
+        valid_supplier_ids = set(valid_supplier_ids)
+    best = {}
+    for hit in hits:
+        sup = hit.get("supplier_id")
+        if sup is None:
+            continue
+        if valid_supplier_ids is not None and sup not in valid_supplier_ids:
+            continue
+        current = best.get(sup)
+        if current is None or hit["score"] > current["score"]:
+            best[sup] = hit
+    if top_k is None or top_k >= len(best):
+        return sorted(best.values(), key=_hit_score, reverse=True)
+    return heapq.nlargest(top_k, best.values(), key=_hit_score)
+
+
+def _is_async_session(db) -> bool:
+    from sqlalchemy.ext.asyncio import AsyncSession
+    return isinstance(db, AsyncSession)
 
 
 # =============== The EnhancedRAGPipeline Class ===============
@@ -210,136 +337,224 @@ class EnhancedRAGPipeline:
                  mongo_uri: str, 
                  openai_api_key: str, 
                  db_session_factory,  # function to create DB session
-                 index_name="default"):
+                 index_name="default",
+                 embedding_cache_size=1024,
+                 embedding_cache_ttl=3600,
+                 summary_concurrency=4,
+                 summary_timeout=20.0,
+                 summary_mode="per_document",
+                 vector_store=None):
         self.mongo_uri = mongo_uri
         self.client = MongoClient(mongo_uri, server_api=ServerApi('1'))
         self.db_mongo = self.client["testdb"]
         self.collection = self.db_mongo["chunks"]
         self.embedding_model = get_embedding_model()
+        # query text -> embedding, so repeated searches skip the model
+        self.embedding_cache = TTLLRUCache(maxsize=embedding_cache_size, ttl_seconds=embedding_cache_ttl)
         self.openai_api_key = openai_api_key
         self.index_name = index_name
         self.db_session_factory = db_session_factory
+        # per-result summaries: max parallel GPT calls and per-call timeout (s)
+        self.summary_concurrency = summary_concurrency
+        self.summary_timeout = summary_timeout
+        # "per_document" (one GPT call per match) or "batch" (one call for all)
+        self.summary_mode = summary_mode
+        # async Mongo client, created lazily inside the running event loop
+        self.async_client = None
+        self._async_collection = None
+        # Atlas $vectorSearch unless another store is given (see vector_store.py)
+        self.vector_store = vector_store or AtlasVectorStore(
+            self.collection, index_name=index_name, async_collection_factory=self._get_async_collection
+        )
 
-    def _get_known_services(self):
+    def _get_known_services(self, db=None):
         """
-        Access Postgres to get the list of services stored in 'services' table.
-        We'll just return their name in a list.
+        Names (lowercase) of the services in the 'services' table, served from
+        the in-process service catalog; it only hits Postgres after a write
+        invalidated it or its TTL ran out.
         """
-        db = self.db_session_factory()
-        try:
-            from models import Service
-            rows = db.query(Service.name).all()
-            # rows is list of (name,) tuples
-            svc_names = [r[0].lower() for r in rows]
-            return svc_names
-        finally:
-            db.close()
+        from service_catalog import service_catalog
+        return service_catalog.service_names(self.db_session_factory, db=db)
 
-    def _get_suppliers_for_service(self, service_name: str):
+    def _get_suppliers_for_service(self, service_name: str, db=None):
         """
         Return a set/list of supplier_ids from the 'supplier_services' 
         association that match service_name.
         If the service doesn't exist, returns an empty list => means no match.
         """
-        db = self.db_session_factory()
-        try:
-            from repository import get_service_by_name, get_suppliers_for_service
-            svc_obj = get_service_by_name(db, service_name.lower())
-            if not svc_obj:
-                return []
-            supplier_ids = get_suppliers_for_service(db, service_name.lower())
-            return supplier_ids
-        finally:
-            db.close()
+        from service_catalog import service_catalog
+        return list(service_catalog.supplier_ids_for(self.db_session_factory, service_name, db=db))
 
-    def advanced_search(self, user_query: str, top_k=3):
-        # 1) known services from DB
-        known_services = self._get_known_services()
-        if not known_services:
-            # If we literally have none in DB, we can't route
-            return []
+    def _search_graph(self, user_query: str, use_async=False, db=None):
+        """
+        Stages 1-4 of the search as a dependency graph:
 
-        # 2) route
-        chosen_service = route_query_llm(user_query, self.openai_api_key, known_services)
-        log_info("RoutingResult", f"Chosen service: {chosen_service}")
-        if chosen_service == "all" or chosen_service not in known_services:
-            return []
+            known_services ──> route ──> supplier_ids
+            sub_queries ─────────────┴─> expansions
 
-        # 2.5) find all suppliers who have that chosen_service
-        valid_supplier_ids = set(self._get_suppliers_for_service(chosen_service))
-        if not valid_supplier_ids:
-            # no suppliers => fallback
-            return []
-        # 3) decomposition
-        sub_queries = decompose_query(user_query, self.openai_api_key, log_event_fn=log_event) or [user_query] 
+        known_services, sub_queries (and the routing call once the services are
+        in) overlap. When routing says 'all' (or no supplier offers the chosen
+        service) the stages that haven't started are cancelled.
 
-        # 4) multi-query expansions on the first sub-query
-        expansions = generate_multi_queries(sub_queries[0], num_queries=2, openai_api_key=self.openai_api_key, log_event_fn=log_event)
+        `db` is the caller's session (a Session, or an AsyncSession on the
+        async path); catalog reloads reuse it instead of checking another
+        connection out of the pool.
+        """
+        api_key = self.openai_api_key
+
+        def route_is_unusable(chosen_service, results):
+            return chosen_service == "all" or chosen_service not in results["known_services"]
+
+        if use_async and _is_async_session(db):
+            # request's AsyncSession: catalog reloads are awaited, no worker thread
+            from service_catalog import service_catalog
+
+            async def known_services():
+                return await service_catalog.service_names_async(db)
+
+            async def supplier_ids(route):
+                return set(await service_catalog.supplier_ids_for_async(db, route))
+        else:
+            def known_services():
+                return self._get_known_services(db=db)
+
+            def supplier_ids(route):
+                return set(self._get_suppliers_for_service(route, db=db))
+
+        if use_async:
+            async def sub_queries():
+                return await decompose_query_async(user_query, api_key, log_event_fn=log_event) or [user_query]
+
+            async def route(known_services):
+                chosen_service = await route_query_llm_async(user_query, api_key, known_services)
+                log_info("RoutingResult", f"Chosen service: {chosen_service}")
+                return chosen_service
+
+            async def expansions(sub_queries, route):
+                return await generate_multi_queries_async(sub_queries[0], num_queries=2, openai_api_key=api_key, log_event_fn=log_event)
+        else:
+            def sub_queries():
+                return decompose_query(user_query, api_key, log_event_fn=log_event) or [user_query]
+
+            def route(known_services):
+                chosen_service = route_query_llm(user_query, api_key, known_services)
+                log_info("RoutingResult", f"Chosen service: {chosen_service}")
+                return chosen_service
+
+            def expansions(sub_queries, route):
+                return generate_multi_queries(sub_queries[0], num_queries=2, openai_api_key=api_key, log_event_fn=log_event)
+
+        graph = StageGraph()
+        # If we literally have no services in DB, we can't route
+        graph.add("known_services", known_services, stop_if=lambda known, _: not known)
+        graph.add("sub_queries", sub_queries)
+        graph.add("route", route, deps=["known_services"], stop_if=route_is_unusable)
+        # no suppliers => fallback
+        graph.add("supplier_ids", supplier_ids, deps=["route"], stop_if=lambda ids, _: not ids)
+        graph.add("expansions", expansions, deps=["sub_queries", "route"])
+        return graph
+
+    def advanced_search(self, user_query: str, top_k=3, db=None):
+        # 1-4) known services, routing, suppliers for the service,
+        # decomposition and multi-query expansions
+        graph = self._search_graph(user_query, db=db)
+        stages = graph.run()
+        if graph.stopped_by:
+            return []
+        valid_supplier_ids = stages["supplier_ids"]
+        sub_queries = stages["sub_queries"]
+        expansions = stages["expansions"]
 
         # 5) gather docs from vector DB
-        # We'll do a simple gather from expansions => combine => re-rank
+        # Embed every expansion + sub-query in one batched call, then fan the
+        # vector searches out from the rows of that matrix. Each search only
+        # considers the routed service's suppliers, and only chunks of their
+        # active (fully ingested) version, so a rare service still gets its
+        # full top_k*2 candidates.
+        search_texts = list(dict.fromkeys(expansions + sub_queries))
+        query_matrix = encode_queries_cached(self.embedding_model, search_texts, self.embedding_cache)
+        versions = active_versions(self.collection, valid_supplier_ids)
         all_results = []
-        for eq in expansions:
-            partial = self._vector_search(eq, top_k=top_k*2)
+        for q_emb in query_matrix:
+            partial = self._vector_search_by_vector(
+                q_emb, top_k=top_k*2, supplier_ids=valid_supplier_ids, versions_by_supplier=versions
+            )
             all_results.extend(partial)
-            
-        print(f"Total results: {len(all_results)}")
-        
 
-        # 5.5) Filter out docs whose supplier_id not in valid_supplier_ids
-        # e.g. a doc from a supplier who doesn't offer 'electrician' => skip
-        filtered_by_service = []
-        for doc in all_results:
-            sup_id = doc.get("supplier_id")
-            if sup_id in valid_supplier_ids:
-                filtered_by_service.append(doc)
-        
-        print(f"Filtered by service: {len(filtered_by_service)}")
-        
-                
-        # 6) deduplicate by supplier_id
-        deduped_by_supplier = {}
-        for r in all_results:
-            if "supplier_id" not in r:
-                continue
-            sup = r["supplier_id"]
-            # if we haven't stored that supplier yet, or if we want the best score chunk
-            if sup not in deduped_by_supplier or r["score"] > deduped_by_supplier[sup]["score"]:
-                deduped_by_supplier[sup] = r
-        final_list = list(deduped_by_supplier.values())
-        
-        print(f"Final list: {len(final_list)}")
-        
-        
-        # # 6.5) re-rank
-        # final = re_rank_results_llm(user_query, final_list, top_k=top_k, openai_api_key=self.openai_api_key)
-        return final_list
-
-    def _vector_search(self, query_text: str, top_k=3, min_score=0.0):
-        q_emb = self.embedding_model.encode([query_text])[0].tolist()
-        pipeline = [
-            {
-                "$vectorSearch": {
-                    "index": self.index_name,
-                    "queryVector": q_emb,
-                    "path": "embedding",
-                    "limit": top_k,
-                    "numCandidates": 50
-                }
-            },
-            {
-                "$project":{
-                    "_id":0,
-                    "supplier_id":1,
-                    "chunk_text":1,
-                    "score":{"$meta":"vectorSearchScore"}
-                }
-            }
-        ]
-        docs = list(self.collection.aggregate(pipeline))
-        # Filter out docs below the threshold
-        results = [d for d in docs if d["score"] >= min_score]
-        return results
+        # strips `versions`; also drops hits of a version switched mid-search
+        all_results = drop_inactive_chunks(all_results, versions)
+        return self._merge_results(all_results, valid_supplier_ids, top_k)
+
+    async def advanced_search_async(self, user_query: str, top_k=3, db=None):
+        """
+        Async version of advanced_search. Steps that don't depend on each other
+        run concurrently; blocking Postgres reads and the embedding model run in
+        worker threads so the event loop stays free.
+        """
+        graph = self._search_graph(user_query, use_async=True, db=db)
+        stages = await graph.run_async()
+        if graph.stopped_by:
+            return []
+        valid_supplier_ids = stages["supplier_ids"]
+        sub_queries = stages["sub_queries"]
+        expansions = stages["expansions"]
+
+        # 5) one batched embedding, then all vector searches at once
+        search_texts = list(dict.fromkeys(expansions + sub_queries))
+        query_matrix, versions = await asyncio.gather(
+            asyncio.to_thread(encode_queries_cached, self.embedding_model, search_texts, self.embedding_cache),
+            active_versions_async(self._get_async_collection(), valid_supplier_ids),
+        )
+        partials = await asyncio.gather(
+            *(
+                self._vector_search_by_vector_async(
+                    q_emb, top_k=top_k*2, supplier_ids=valid_supplier_ids, versions_by_supplier=versions
+                )
+                for q_emb in query_matrix
+            )
+        )
+        all_results = [doc for partial in partials for doc in partial]
+        all_results = drop_inactive_chunks(all_results, versions)
+        return self._merge_results(all_results, valid_supplier_ids, top_k)
+
+    def _merge_results(self, all_results, valid_supplier_ids, top_k=None):
+        merged = merge_supplier_hits(all_results, valid_supplier_ids, top_k)
+        log_info("SearchResultsMerged", f"{len(all_results)} hits -> {len(merged)} suppliers")
+        return merged
+
+    def _vector_search(self, query_text: str, top_k=3, min_score=0.0, supplier_ids=None, versions_by_supplier=None):
+        """
+        Top chunks for query_text; with supplier_ids, only from those
+        suppliers, and with versions_by_supplier only from their active
+        versions (both filtered inside the index, before the top_k cut).
+        """
+        q_emb = encode_queries_cached(self.embedding_model, [query_text], self.embedding_cache)[0]
+        return self._vector_search_by_vector(
+            q_emb, top_k=top_k, min_score=min_score,
+            supplier_ids=supplier_ids, versions_by_supplier=versions_by_supplier
+        )
+
+    def _vector_search_by_vector(self, q_emb, top_k=3, min_score=0.0, supplier_ids=None, versions_by_supplier=None):
+        """
+        Same as _vector_search, but takes an already computed query embedding.
+        """
+        return self.vector_store.search(
+            q_emb, top_k=top_k, min_score=min_score,
+            supplier_ids=supplier_ids, versions_by_supplier=versions_by_supplier
+        )
+
+    def _get_async_collection(self):
+        if self._async_collection is None:
+            self.async_client = AsyncMongoClient(self.mongo_uri, server_api=ServerApi('1'))
+            self._async_collection = self.async_client["testdb"]["chunks"]
+        return self._async_collection
+
+    async def _vector_search_by_vector_async(self, q_emb, top_k=3, min_score=0.0, supplier_ids=None,
+                                             versions_by_supplier=None):
+        return await self.vector_store.search_async(
+            q_emb, top_k=top_k, min_score=min_score,
+            supplier_ids=supplier_ids, versions_by_supplier=versions_by_supplier
+        )
 
     def get_structured_summary(self, user_query: str, final_sorted_results: list):
         """
@@ -356,3 +571,98 @@ class EnhancedRAGPipeline:
             log_event_fn=log_event
         )
         return structured
+
+    async def get_structured_summary_async(self, user_query: str, final_sorted_results: list):
+        """
+        Async version of get_structured_summary.
+        """
+        top_docs = final_sorted_results[:3]
+        return await ask_chatgpt_structured_async(
+            user_query=user_query,
+            retrieved_docs=top_docs,
+            openai_api_key=self.openai_api_key,
+            method="pydantic",
+            log_event_fn=log_event
+        )
+
+    async def get_structured_summaries_async(self, user_query: str, matches: list):
+        """
+        One structured summary per match, at most summary_concurrency GPT calls
+        in flight. A call that fails or exceeds summary_timeout yields None for
+        that match instead of failing the whole page.
+        Returns a list aligned with `matches`.
+
+        With summary_mode="batch" all matches are summarized by a single call
+        instead (see get_batched_summaries_async).
+        """
+        if self.summary_mode == "batch":
+            return await self.get_batched_summaries_async(user_query, matches)
+
+        semaphore = asyncio.Semaphore(max(1, self.summary_concurrency))
+        return await asyncio.gather(
+            *(self._summarize_one_async(user_query, m, semaphore) for m in matches)
+        )
+
+    async def iter_structured_summaries_async(self, user_query: str, matches: list):
+        """
+        Async generator of (index, summary) pairs in completion order, for
+        streaming responses. Same concurrency / timeout rules as
+        get_structured_summaries_async; unfinished calls are cancelled if the
+        consumer stops early (e.g. the client disconnected).
+        """
+        if self.summary_mode == "batch":
+            summaries = await self.get_batched_summaries_async(user_query, matches)
+            for i, summary in enumerate(summaries):
+                yield i, summary
+            return
+
+        semaphore = asyncio.Semaphore(max(1, self.summary_concurrency))
+
+        async def summarize(i, match):
+            return i, await self._summarize_one_async(user_query, match, semaphore)
+
+        tasks = [asyncio.ensure_future(summarize(i, m)) for i, m in enumerate(matches)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _summarize_one_async(self, user_query: str, match: dict, semaphore):
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(
+                    self.get_structured_summary_async(user_query, [match]),
+                    timeout=self.summary_timeout,
+                )
+            except asyncio.TimeoutError:
+                log_error("StructuredSummaryTimeout", f"supplier_id={match.get('supplier_id')}")
+            except Exception as e:
+                log_error("StructuredSummaryError", f"supplier_id={match.get('supplier_id')}: {str(e)}")
+            return None
+
+    async def get_batched_summaries_async(self, user_query: str, matches: list):
+        """
+        Summarize every match with one completion (few-shot preamble sent once).
+        Returns a list aligned with `matches`; suppliers missing from the
+        answer, or every entry if the call fails or times out, are None.
+        """
+        if not matches:
+            return []
+        try:
+            by_supplier = await asyncio.wait_for(
+                ask_chatgpt_structured_async(
+                    user_query=user_query,
+                    retrieved_docs=matches,
+                    openai_api_key=self.openai_api_key,
+                    method="batch",
+                    log_event_fn=log_event
+                ),
+                timeout=self.summary_timeout,
+            )
+        except asyncio.TimeoutError:
+            log_error("StructuredSummaryTimeout", f"batch of {len(matches)}")
+            by_supplier = None
+        by_supplier = by_supplier or {}
+        return [by_supplier.get(str(m.get("supplier_id"))) for m in matches]
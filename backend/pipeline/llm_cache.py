@@ -0,0 +1,213 @@
+# pipeline/llm_cache.py
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import openai
+
+from .cache_utils import TTLLRUCache
+from .log_util import log_info, log_warning
+
+# One openai.Client per API key for the whole process, instead of one per call.
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_openai_client(openai_api_key: str):
+    client = _CLIENTS.get(openai_api_key)
+    if client is None:
+        with _CLIENTS_LOCK:
+            client = _CLIENTS.get(openai_api_key)
+            if client is None:
+                client = openai.Client(api_key=openai_api_key)
+                _CLIENTS[openai_api_key] = client
+    return client
+
+
+def get_async_openai_client(openai_api_key: str):
+    """
+    Shared openai.AsyncClient for the async search path.
+    """
+    key = ("async", openai_api_key)
+    client = _CLIENTS.get(key)
+    if client is None:
+        with _CLIENTS_LOCK:
+            client = _CLIENTS.get(key)
+            if client is None:
+                client = openai.AsyncClient(api_key=openai_api_key)
+                _CLIENTS[key] = client
+    return client
+
+
+def make_cache_key(fn_name: str, model: str, messages, params: dict) -> str:
+    payload = json.dumps(
+        {"fn": fn_name, "model": model, "messages": messages, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache of chat completion texts:
+      1) in-memory TTLLRUCache (per process)
+      2) optional SQLite file shared by every worker on the host
+
+    Keys are make_cache_key(function, model, messages, params).
+    The SQLite connection is opened on first use in each process, so a
+    cache created before a pre-forking server forks is safe in the workers.
+    """
+
+    def __init__(self, maxsize=2048, ttl_seconds=24 * 3600, sqlite_path=None):
+        self.memory = TTLLRUCache(maxsize=maxsize, ttl_seconds=ttl_seconds)
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self.sqlite_path = sqlite_path
+        self.disk_hits = 0
+        self._conn = None
+        self._conn_pid = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        """
+        This process' SQLite connection (call with self._lock held). A
+        connection inherited across fork() is never used: the child opens
+        its own.
+        """
+        if self._conn is None or self._conn_pid != os.getpid():
+            conn = sqlite3.connect(self.sqlite_path, check_same_thread=False, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    fn TEXT,
+                    model TEXT,
+                    response TEXT,
+                    created_at REAL
+                )
+                """
+            )
+            conn.commit()
+            self._conn, self._conn_pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None or not self.sqlite_path:
+            return value
+        return self.disk_get(key)
+
+    def disk_get(self, key):
+        """
+        The SQLite tier of get(): blocks on the disk and the connection lock,
+        so async callers run it in a thread.
+        """
+        try:
+            with self._lock:
+                row = self._connection().execute(
+                    "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            log_warning("LLMCacheDiskError", f"get: {str(e)}")
+            return None
+        if not row:
+            return None
+        response, created_at = row
+        if self.ttl_seconds and created_at + self.ttl_seconds <= time.time():
+            return None
+        self.disk_hits += 1
+        # promote to the memory tier
+        self.memory.set(key, response)
+        return response
+
+    def set(self, key, response, fn_name="", model=""):
+        self.memory.set(key, response)
+        if self.sqlite_path:
+            self.disk_set(key, response, fn_name, model)
+
+    def disk_set(self, key, response, fn_name="", model=""):
+        """
+        The SQLite tier of set(); see disk_get.
+        """
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, fn, model, response, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, fn_name, model, response, time.time()),
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            log_warning("LLMCacheDiskError", f"set: {str(e)}")
+
+    def stats(self):
+        stats = self.memory.stats()
+        stats["disk_hits"] = self.disk_hits
+        stats["sqlite_path"] = self.sqlite_path
+        return stats
+
+
+_llm_cache = LLMResponseCache()
+
+
+def configure_llm_cache(maxsize=2048, ttl_seconds=24 * 3600, sqlite_path=None):
+    """
+    Replace the process-wide LLM response cache (e.g. to add the SQLite tier).
+    """
+    global _llm_cache
+    _llm_cache = LLMResponseCache(maxsize=maxsize, ttl_seconds=ttl_seconds, sqlite_path=sqlite_path)
+    log_info("LLMCacheConfigured", f"maxsize={maxsize}, ttl={ttl_seconds}, sqlite={sqlite_path}")
+    return _llm_cache
+
+
+def get_llm_cache():
+    return _llm_cache
+
+
+def cached_chat_completion(fn_name: str, openai_api_key: str, model: str, messages, **params) -> str:
+    """
+    Return the message content of a chat completion, served from the LLM cache
+    when the same (function, model, messages, params) was seen before.
+    Errors from the API are not cached and propagate to the caller.
+    """
+    cache = _llm_cache
+    key = make_cache_key(fn_name, model, messages, params)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    client = get_openai_client(openai_api_key)
+    resp = client.chat.completions.create(model=model, messages=messages, **params)
+    content = resp.choices[0].message.content
+    if content is not None:
+        cache.set(key, content, fn_name=fn_name, model=model)
+    return content
+
+
+async def cached_chat_completion_async(fn_name: str, openai_api_key: str, model: str, messages, **params) -> str:
+    """
+    Async twin of cached_chat_completion, sharing the same cache and keys.
+    The memory tier is read inline; the SQLite tier runs in a thread, so a
+    disk read, commit or lock wait never blocks the event loop.
+    """
+    cache = _llm_cache
+    key = make_cache_key(fn_name, model, messages, params)
+    cached = cache.memory.get(key)
+    if cached is None and cache.sqlite_path:
+        cached = await asyncio.to_thread(cache.disk_get, key)
+    if cached is not None:
+        return cached
+
+    client = get_async_openai_client(openai_api_key)
+    resp = await client.chat.completions.create(model=model, messages=messages, **params)
+    content = resp.choices[0].message.content
+    if content is not None:
+        cache.memory.set(key, content)
+        if cache.sqlite_path:
+            await asyncio.to_thread(cache.disk_set, key, content, fn_name, model)
+    return content
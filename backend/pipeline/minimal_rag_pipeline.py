@@ -4,8 +4,11 @@ import openai
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
 
-from .chunking_utils import read_and_chunk_pdf_adaptive
-from .embedding_utils import get_embedding_model, batch_embed_texts
+from .chunking_utils import iter_pdf_chunks
+from .embedding_utils import get_embedding_model, encode_queries_cached
+from .chunk_store import hash_pdf, get_current_document, sync_supplier_chunks, active_versions, drop_inactive_chunks
+from .cache_utils import TTLLRUCache
+from .vector_store import AtlasVectorStore
 
 class MinimalRAGPipeline:
     """
@@ -13,62 +16,44 @@ class MinimalRAGPipeline:
     2) Direct vector search -> return top docs
     """
 
-    def __init__(self, mongo_uri, openai_api_key=None):
+    def __init__(self, mongo_uri, openai_api_key=None, embedding_cache_size=1024, embedding_cache_ttl=3600,
+                 vector_store=None):
         self.mongo_uri = mongo_uri
         self.client = MongoClient(self.mongo_uri, server_api=ServerApi('1'))
         self.db = self.client["testdb"]
         self.collection = self.db["chunks"]
         self.embedding_model = get_embedding_model()
+        self.embedding_cache = TTLLRUCache(maxsize=embedding_cache_size, ttl_seconds=embedding_cache_ttl)
         self.openai_api_key = openai_api_key
         if openai_api_key:
             openai.api_key = openai_api_key
+        self.vector_store = vector_store or AtlasVectorStore(self.collection, index_name="default")
 
     def ingest_supplier_pdf(self, pdf_path: str, supplier_id: str):
-        # Remove old docs for that supplier
-        self.collection.delete_many({"supplier_id": supplier_id})
-
-        # chunk
-        chunks = read_and_chunk_pdf_adaptive(pdf_path)
-        if not chunks:
+        # store the PDF as a new version of the supplier's chunks (embedding
+        # only new texts); an unchanged re-upload has nothing to do
+        doc_hash = hash_pdf(pdf_path)
+        current = get_current_document(self.collection, supplier_id, doc_hash)
+        if current:
+            num_chunks = current["num_chunks"]
+        else:
+            chunks = iter_pdf_chunks(pdf_path)
+            num_chunks = sync_supplier_chunks(
+                self.embedding_model, self.collection, supplier_id, doc_hash, chunks
+            )["chunks"]
+        self.vector_store.sync_supplier(self.collection, supplier_id)
+        if not num_chunks:
             return "unknown"
-
-        # embed
-        embs = batch_embed_texts(self.embedding_model, chunks, batch_size=16)
-
-        # store
-        docs = []
-        for i, chunk_text in enumerate(chunks):
-            docs.append({
-                "supplier_id": supplier_id,
-                "chunk_text": chunk_text,
-                "embedding": embs[i].tolist()
-            })
-        if docs:
-            self.collection.insert_many(docs)
         return "done"
 
-    def search_suppliers(self, query: str, top_k=10):
+    def search_suppliers(self, query: str, top_k=10, supplier_ids=None):
         # 1) embed the query
-        q_emb = self.embedding_model.encode([query])[0].tolist()
-        # 2) do a vector search in mongo
-        pipeline = [
-            {
-                "$vectorSearch": {
-                    "index": "default",  # must exist in MongoDB Atlas
-                    "queryVector": q_emb,
-                    "path": "embedding",
-                    "limit": top_k * 2,
-                    "numCandidates": 50
-                }
-            },
-            {
-                "$project": {
-                    "_id": 0,
-                    "supplier_id": 1,
-                    "chunk_text": 1,
-                    "score": {"$meta": "vectorSearchScore"}
-                }
-            }
-        ]
-        results = list(self.collection.aggregate(pipeline))
-        return results
+        q_emb = encode_queries_cached(self.embedding_model, [query], self.embedding_cache)[0]
+        # 2) vector search (Atlas $vectorSearch or the local index),
+        # optionally restricted to supplier_ids, on active versions only
+        versions = active_versions(self.collection, supplier_ids)
+        results = self.vector_store.search(
+            q_emb, top_k=top_k * 2, supplier_ids=supplier_ids, versions_by_supplier=versions
+        )
+        # strips `versions`; also drops hits of a version switched mid-search
+        return drop_inactive_chunks(results, versions)
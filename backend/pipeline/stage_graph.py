@@ -0,0 +1,123 @@
+# pipeline/stage_graph.py
+import asyncio
+import inspect
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from .log_util import log_info
+
+# Shared pool for the sync search path; stages are mostly I/O bound
+# (LLM round trips, Postgres reads), so a handful of threads is plenty.
+_STAGE_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rag-stage")
+
+
+class _Stage:
+    def __init__(self, name, fn, deps, stop_if):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.stop_if = stop_if
+
+
+class StageGraph:
+    """
+    Tiny dependency graph for pipeline stages.
+
+    Each stage is fn(**{dep_name: dep_result}); a stage starts as soon as all
+    of its deps have finished, so independent stages overlap. If a stage's
+    stop_if(result, results) returns True, stages that haven't started are
+    cancelled and the run returns early with `stopped_by` set.
+
+        graph = StageGraph()
+        graph.add("known", get_services)
+        graph.add("sub_queries", decompose)
+        graph.add("route", route, deps=["known"], stop_if=lambda r, _: r == "all")
+        results = graph.run()
+    """
+
+    def __init__(self, executor=None):
+        self.executor = executor or _STAGE_EXECUTOR
+        self.stages = {}
+        self.stopped_by = None
+
+    def add(self, name, fn, deps=(), stop_if=None):
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self.stages[name] = _Stage(name, fn, deps, stop_if)
+        return self
+
+    def _ready(self, results, started):
+        return [
+            s for s in self.stages.values()
+            if s.name not in started and all(d in results for d in s.deps)
+        ]
+
+    def _should_stop(self, stage, results):
+        if stage.stop_if and stage.stop_if(results[stage.name], results):
+            self.stopped_by = stage.name
+            log_info("StageGraphStopped", f"stopped by '{stage.name}'")
+            return True
+        return False
+
+    def run(self):
+        """
+        Run the graph on the thread pool; returns {stage_name: result}.
+        Exceptions raised by a stage propagate to the caller.
+        """
+        results, started, running = {}, set(), {}
+        self.stopped_by = None
+        try:
+            while True:
+                for stage in self._ready(results, started):
+                    started.add(stage.name)
+                    kwargs = {d: results[d] for d in stage.deps}
+                    running[self.executor.submit(stage.fn, **kwargs)] = stage
+                if not running:
+                    return results
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    stage = running.pop(fut)
+                    results[stage.name] = fut.result()
+                    if self._should_stop(stage, results):
+                        return results
+        finally:
+            # on stop or a failed stage: threads can't be interrupted, but
+            # drop what hasn't started
+            for pending in running:
+                pending.cancel()
+
+    async def run_async(self):
+        """
+        Same as run(), on the event loop. Coroutine stages are awaited, plain
+        functions run in a worker thread; on stop or an exception, the other
+        tasks are cancelled.
+        """
+        results, started, running = {}, set(), {}
+        self.stopped_by = None
+        try:
+            while True:
+                for stage in self._ready(results, started):
+                    started.add(stage.name)
+                    kwargs = {d: results[d] for d in stage.deps}
+                    if inspect.iscoroutinefunction(stage.fn):
+                        coro = stage.fn(**kwargs)
+                    else:
+                        coro = asyncio.to_thread(stage.fn, **kwargs)
+                    running[asyncio.ensure_future(coro)] = stage
+                if not running:
+                    return results
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    stage = running.pop(task)
+                    results[stage.name] = task.result()
+                    if self._should_stop(stage, results):
+                        return results
+        finally:
+            # on stop, a failed stage or our own cancellation: cancel the
+            # other tasks and wait for them, so none outlives the run
+            for pending in running:
+                pending.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
@@ -1,19 +1,34 @@
 ##########################################################
 # pipeline/structured_output/structured_out.py
 ##########################################################
-import openai
-from typing import Optional
+import json
+from typing import List, Optional
+from pydantic import BaseModel, ValidationError
+from .llm_cache import get_openai_client, get_async_openai_client
 from .log_util import log_info, log_error
 
-def build_summary_prompt(user_query, docs):
-    combined_docs = "\n\n".join([f"- {d['chunk_text']}" for d in docs])
-    few_shot_example = """
+_FEW_SHOT_EXAMPLE = """
     Example Q: "I need someone with plumbing experience."
     Example A:
     Candidate Name: John Smith
     Key Strengths: Pipe installation, fixture repairs
     Reasoning: They have proven plumbing experience from past roles
     """
+
+
+class CandidateSummary(BaseModel):
+    """
+    One supplier's entry in a batched structured summary.
+    """
+    supplier_id: str
+    candidate_name: str = ""
+    key_strengths: List[str] = []
+    reasoning: str = ""
+
+
+def build_summary_prompt(user_query, docs):
+    combined_docs = "\n\n".join([f"- {d['chunk_text']}" for d in docs])
+    few_shot_example = _FEW_SHOT_EXAMPLE
     prompt = f"""
     You are a helpful AI that reads candidate resumes. Use the context below
     to answer the user's query in a structured way.
@@ -34,70 +49,57 @@ def build_summary_prompt(user_query, docs):
     """
     return prompt
 
-def ask_chatgpt_structured(user_query, retrieved_docs, openai_api_key=None, method="pydantic", log_event_fn=None):
-    if not retrieved_docs:
-        return {
-            "candidate_name": "",
-            "key_strengths": [],
-            "reasoning": "No documents found."
-        }
+def build_batch_summary_prompt(user_query, matches):
+    """
+    Like build_summary_prompt, but for several suppliers at once: the few-shot
+    preamble is sent once and each supplier's context is labelled by its id.
+    """
+    combined_docs = "\n\n".join(
+        [f"[Supplier {m['supplier_id']}]\n- {m['chunk_text']}" for m in matches]
+    )
+    prompt = f"""
+    You are a helpful AI that reads candidate resumes. Use the context below
+    to answer the user's query in a structured way, once per supplier.
 
-    if method == "function_calling":
-        functions = [
-            {
-                "name": "recommend_candidate",
-                "description": "Return structured info about candidate",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "candidate_name": {"type": "string"},
-                        "key_strengths": {"type": "array", "items": {"type": "string"}},
-                        "reasoning": {"type": "string"}
-                    },
-                    "required": ["candidate_name", "key_strengths", "reasoning"]
-                },
-            }
-        ]
-
-        prompt_content = build_summary_prompt(user_query, retrieved_docs)
+    [Few Shot Example]
+    {_FEW_SHOT_EXAMPLE}
 
-        try:
-            client = openai.Client(api_key=openai_api_key)
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo-0125",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": prompt_content}
-                ],
-                functions=functions,
-                function_call={"name": "recommend_candidate"}
-            )
-            message = response.choices[0].message
-            fc = getattr(message, "function_call", None)
-            if fc is None:
-                structured_json = None
-            elif isinstance(fc, dict):
-                structured_json = fc.get("arguments")
-            else:
-                structured_json = getattr(fc, "arguments", None)
-
-            if log_event_fn:
-                log_event_fn("StructuredOutputFunctionCall", structured_json)
-            else:
-                log_info("StructuredOutputFunctionCall", str(structured_json))
-
-            return structured_json
-        except Exception as e:
-            if log_event_fn:
-                log_event_fn("StructuredOutputError", str(e))
-            else:
-                log_error("StructuredOutputError", str(e))
-            return None
+    [User Query]
+    {user_query}
 
-    else:
-        # pydantic approach
-        prompt_content = build_summary_prompt(user_query, retrieved_docs)
-        pydantic_instructions = """
+    [Context]
+    {combined_docs}
+
+    For every supplier above, provide:
+    1) Candidate Name (if known)
+    2) Key Strengths
+    3) Reasoning for why they match the query
+    """
+    return prompt
+
+_EMPTY_SUMMARY = {
+    "candidate_name": "",
+    "key_strengths": [],
+    "reasoning": "No documents found."
+}
+
+_RECOMMEND_CANDIDATE_FUNCTIONS = [
+    {
+        "name": "recommend_candidate",
+        "description": "Return structured info about candidate",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "candidate_name": {"type": "string"},
+                "key_strengths": {"type": "array", "items": {"type": "string"}},
+                "reasoning": {"type": "string"}
+            },
+            "required": ["candidate_name", "key_strengths", "reasoning"]
+        },
+    }
+]
+
+_PYDANTIC_INSTRUCTIONS = """
         Please return valid JSON with the following keys:
         {
             "candidate_name": "<string>",
@@ -105,28 +107,153 @@ def ask_chatgpt_structured(user_query, retrieved_docs, openai_api_key=None, meth
             "reasoning": "<string>"
         }
         """
-        full_prompt = prompt_content + "\n" + pydantic_instructions
 
+
+_BATCH_INSTRUCTIONS = """
+        Please return a valid JSON array with one object per supplier, in the
+        same order as the context, each with the following keys:
+        {
+            "supplier_id": "<string, copied from the context label>",
+            "candidate_name": "<string>",
+            "key_strengths": ["<string>", "<string>"],
+            "reasoning": "<string>"
+        }
+        Return only the JSON array.
+        """
+
+
+def _build_structured_request(user_query, retrieved_docs, method):
+    """
+    Keyword arguments for chat.completions.create for the given method.
+    """
+    if method == "batch":
+        full_prompt = build_batch_summary_prompt(user_query, retrieved_docs) + "\n" + _BATCH_INSTRUCTIONS
+        return {
+            "model": "gpt-3.5-turbo-0125",
+            "messages": [{"role": "user", "content": full_prompt}],
+            "temperature": 0.7,
+        }
+    prompt_content = build_summary_prompt(user_query, retrieved_docs)
+    if method == "function_calling":
+        return {
+            "model": "gpt-3.5-turbo-0125",
+            "messages": [
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": prompt_content}
+            ],
+            "functions": _RECOMMEND_CANDIDATE_FUNCTIONS,
+            "function_call": {"name": "recommend_candidate"},
+        }
+    # pydantic approach
+    full_prompt = prompt_content + "\n" + _PYDANTIC_INSTRUCTIONS
+    return {
+        "model": "gpt-3.5-turbo-0125",
+        "messages": [{"role": "user", "content": full_prompt}],
+        "temperature": 0.7,
+    }
+
+
+def _parse_structured_response(response, method, log_event_fn=None):
+    message = response.choices[0].message
+    if method == "function_calling":
+        fc = getattr(message, "function_call", None)
+        if fc is None:
+            structured_json = None
+        elif isinstance(fc, dict):
+            structured_json = fc.get("arguments")
+        else:
+            structured_json = getattr(fc, "arguments", None)
+
+        if log_event_fn:
+            log_event_fn("StructuredOutputFunctionCall", structured_json)
+        else:
+            log_info("StructuredOutputFunctionCall", str(structured_json))
+        return structured_json
+
+    if method == "batch":
+        return _parse_batch_summaries(message.content, log_event_fn)
+
+    structured_data = json.loads(message.content)
+    if log_event_fn:
+        log_event_fn("StructuredOutputPydantic", structured_data)
+    else:
+        log_info("StructuredOutputPydantic", str(structured_data))
+    return structured_data
+
+
+def _parse_batch_summaries(content, log_event_fn=None):
+    """
+    Parse the batched JSON array; entries that don't validate against
+    CandidateSummary are dropped (and logged) instead of failing the batch.
+    Returns {supplier_id: summary_dict}.
+    """
+    items = json.loads(content)
+    if isinstance(items, dict):
+        # some completions wrap the array, e.g. {"candidates": [...]}
+        items = next((v for v in items.values() if isinstance(v, list)), [])
+
+    summaries = {}
+    for item in items:
         try:
-            client = openai.Client(api_key=openai_api_key)
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo-0125",
-                messages=[{"role": "user", "content": full_prompt}],
-                temperature=0.7
-            )
-            content = response.choices[0].message.content
-            import json
-            structured_data = json.loads(content)
-
-            if log_event_fn:
-                log_event_fn("StructuredOutputPydantic", structured_data)
-            else:
-                log_info("StructuredOutputPydantic", str(structured_data))
-
-            return structured_data
-        except Exception as e:
-            if log_event_fn:
-                log_event_fn("StructuredOutputError", str(e))
-            else:
-                log_error("StructuredOutputError", str(e))
-            return None
+            candidate = CandidateSummary(**item)
+        except (TypeError, ValidationError) as e:
+            _log_structured_error(e, log_event_fn)
+            continue
+        summaries[candidate.supplier_id] = {
+            "candidate_name": candidate.candidate_name,
+            "key_strengths": candidate.key_strengths,
+            "reasoning": candidate.reasoning,
+        }
+
+    if log_event_fn:
+        log_event_fn("StructuredOutputBatch", summaries)
+    else:
+        log_info("StructuredOutputBatch", str(summaries))
+    return summaries
+
+
+def _log_structured_error(e, log_event_fn=None):
+    if log_event_fn:
+        log_event_fn("StructuredOutputError", str(e))
+    else:
+        log_error("StructuredOutputError", str(e))
+
+
+def ask_chatgpt_structured(user_query, retrieved_docs, openai_api_key=None, method="pydantic", log_event_fn=None):
+    """
+    method="pydantic" / "function_calling": one summary dict for retrieved_docs.
+    method="batch": retrieved_docs are supplier matches (each with supplier_id);
+    returns {supplier_id: summary_dict} from a single completion.
+    """
+    if method == "batch" and not retrieved_docs:
+        return {}
+    if not retrieved_docs:
+        return dict(_EMPTY_SUMMARY)
+
+    request = _build_structured_request(user_query, retrieved_docs, method)
+    try:
+        client = get_openai_client(openai_api_key)
+        response = client.chat.completions.create(**request)
+        return _parse_structured_response(response, method, log_event_fn)
+    except Exception as e:
+        _log_structured_error(e, log_event_fn)
+        return None
+
+
+async def ask_chatgpt_structured_async(user_query, retrieved_docs, openai_api_key=None, method="pydantic", log_event_fn=None):
+    """
+    Async version of ask_chatgpt_structured, using the shared openai.AsyncClient.
+    """
+    if method == "batch" and not retrieved_docs:
+        return {}
+    if not retrieved_docs:
+        return dict(_EMPTY_SUMMARY)
+
+    request = _build_structured_request(user_query, retrieved_docs, method)
+    try:
+        client = get_async_openai_client(openai_api_key)
+        response = await client.chat.completions.create(**request)
+        return _parse_structured_response(response, method, log_event_fn)
+    except Exception as e:
+        _log_structured_error(e, log_event_fn)
+        return None
@@ -2,12 +2,17 @@
 import os
 import openai
 import re
+from itertools import chain, islice
 from typing import List, Dict, Any
 from sqlalchemy.orm import Session
-from .chunking_utils import read_and_chunk_pdf_adaptive
-from .embedding_utils import batch_embed_texts
+from .chunking_utils import iter_pdf_chunks
+from .chunk_store import hash_pdf, get_current_document, sync_supplier_chunks, mark_roles_linked
 import repository, schemas
 from .roles import KNOWN_ROLES  # import the list
+from .log_util import log_info
+
+# Chunks embedded and inserted per batch: bounds ingestion memory for long PDFs
+INGEST_BATCH_SIZE = 64
 
 # def detect_roles_from_text(text_snippet: str, openai_api_key: str, num_roles=3) -> List[str]:
 #     """
@@ -48,10 +53,11 @@ from .roles import KNOWN_ROLES  # import the list
 
 # Huy's version
 
-def detect_roles_from_text(text_snippet: str, openai_api_key: str, num_roles=3) -> List[str]:
+def detect_roles_from_text(text_snippet: str, openai_api_key: str, num_roles=3, raise_errors=False) -> List[str]:
     """
     Use OpenAI to guess up to 'num_roles' possible roles from the text.
     Only returns roles that appear in the known roles list (KNOWN_ROLES).
+    OpenAI errors give [] unless raise_errors is set.
     """
     if not openai_api_key:
         return []
@@ -88,6 +94,8 @@ def detect_roles_from_text(text_snippet: str, openai_api_key: str, num_roles=3)
                     break
         return valid_roles
     except Exception as e:
+        if raise_errors:
+            raise
         print("Error detecting roles with OpenAI:", e)
         return []
 
@@ -97,50 +105,67 @@ def ingest_supplier_pdf(
     pipeline,               # RAGPipeline instance (for embeddings, collection)
     pdf_path: str,
     supplier_id: str,
-    openai_api_key: str
+    openai_api_key: str,
+    embedding_slots=None
 ):
     """
     1) Read & chunk PDF
     2) Embed in vector DB
     3) Use OpenAI to guess multiple roles -> store in Services & link in SupplierServices
+
+    embedding_slots: optional semaphore held while embedding, to cap how many
+    ingestions run the embedding model at once (see ingestion_queue).
     """
-    # Step A: chunk PDF
-    chunks = read_and_chunk_pdf_adaptive(pdf_path, max_words=150)
-    print("DEBUG: Extracted chunks:", chunks)
-    if not chunks:
-        return "No text found"
+    # Step A: skip re-uploads of the document that is already fully ingested.
+    # A document whose chunks are stored but whose roles never got linked
+    # (the run failed after step C) only redoes steps D-E.
+    doc_hash = hash_pdf(pdf_path)
+    current = get_current_document(pipeline.collection, supplier_id, doc_hash)
+    if current and current.get("roles_linked"):
+        # a local index may still miss it (e.g. saved before a crash)
+        pipeline.vector_store.sync_supplier(pipeline.collection, supplier_id)
+        return "Document unchanged, nothing to ingest"
 
-    # Step B: remove old docs from the vector DB for that supplier
-    pipeline.collection.delete_many({"supplier_id": supplier_id})
+    # Step B: chunk PDF (streamed page by page)
+    chunks = iter_pdf_chunks(pdf_path, max_words=150)
+    # the first chunks are kept for role detection
+    first_chunks = list(islice(chunks, 3))
+    if not first_chunks:
+        return "No text found"
 
-    # Step C: embed & store in vector DB
-    embs = batch_embed_texts(pipeline.embedding_model, chunks, batch_size=16)
-    docs_to_insert = []
-    for i, chunk_text in enumerate(chunks):
-        docs_to_insert.append({
-            "supplier_id": supplier_id,
-            "chunk_text": chunk_text,
-            "embedding": embs[i].tolist()
-        })
-    if docs_to_insert:
-        pipeline.collection.insert_many(docs_to_insert)
+    # Step C: embed & upsert only new chunks, INGEST_BATCH_SIZE at a time, as
+    # a new version that becomes active once it's complete
+    if current:
+        stats = {"chunks": current["num_chunks"], "embedded": 0, "unchanged": current["num_chunks"]}
+    else:
+        stats = sync_supplier_chunks(
+            pipeline.embedding_model,
+            pipeline.collection,
+            supplier_id,
+            doc_hash,
+            chain(first_chunks, chunks),
+            batch_size=INGEST_BATCH_SIZE,
+            embedding_slots=embedding_slots
+        )
+    # refresh this supplier's rows when searches run on a local index
+    pipeline.vector_store.sync_supplier(pipeline.collection, supplier_id)
 
     # Step D: combine chunk text into a snippet for role detection
-    combined_text = " ".join(chunks[:3])  # just first 3 chunks
-    print("DEBUG: Combined text for role detection:", combined_text)
-    roles_detected = detect_roles_from_text(combined_text, openai_api_key, num_roles=5)
+    combined_text = " ".join(first_chunks)  # just first 3 chunks
+    # errors propagate, so the ingestion queue retries instead of recording "no roles"
+    roles_detected = detect_roles_from_text(combined_text, openai_api_key, num_roles=5, raise_errors=True)
+    log_info("SupplierRolesDetected", f"{supplier_id}: {roles_detected}")
 
-    # Step E: store each role in Postgres & link to supplier
-    for role in roles_detected:
-        svc = repository.get_service_by_name(db, role)
-        if not svc:
-            # create new service
-            svc_create = schemas.ServiceCreate(name=role, description="")
-            svc = repository.create_service(db, svc_create)
-        # link
-        repository.link_supplier_service(db, supplier_id, svc.id)
+    # Step E: store all roles in Postgres & link them to the supplier
+    # (one bulk upsert, one commit)
+    repository.store_and_link_services(db, supplier_id, roles_detected)
+    # only now is the document done: re-uploads of it are skipped from here on
+    mark_roles_linked(pipeline.collection, supplier_id, doc_hash)
 
-    return f"Ingested {len(docs_to_insert)} chunks, detected roles: {roles_detected}"
+    return (
+        f"Ingested {stats['chunks']} chunks ({stats['embedded']} embedded, {stats['unchanged']} unchanged), "
+        f"detected roles: {roles_detected}"
+    )
 
 def detect_skills_from_text(text_snippet: str, openai_api_key: str, num_skills: int = 5) -> List[str]:
     """
@@ -231,8 +256,8 @@ def ingest_supplier_pdf_with_summary(
     
     Steps:
       1. Read and chunk the PDF.
-      2. Optionally clear previous vector docs for this supplier.
-      3. Embed the chunks and (optionally) store them in the vector DB.
+      2-3. Embed new chunks and sync this supplier's vector docs (skipped
+         when the same PDF was already ingested).
       4. Combine a snippet from the first few chunks.
       5. Detect roles from the snippet using OpenAI.
       6. Detect key skills from the snippet.
@@ -244,30 +269,32 @@ def ingest_supplier_pdf_with_summary(
       - Detected skills.
       - A summary of the PDF content.
     """
-    # Step 1: Chunk the PDF.
-    chunks = read_and_chunk_pdf_adaptive(pdf_path, max_words=150)
-    print("DEBUG: Extracted chunks:", chunks)
-    if not chunks:
+    # Step 1: Chunk the PDF (streamed page by page).
+    chunks = iter_pdf_chunks(pdf_path, max_words=150)
+    first_chunks = list(islice(chunks, 3))
+    if not first_chunks:
         return {"error": "No text found in the PDF."}
     
-    # Step 2: Optionally clear old docs for this supplier from the vector DB.
-    pipeline.collection.delete_many({"supplier_id": supplier_id})
-    
-    # Step 3: Embed the chunks.
-    embs = batch_embed_texts(pipeline.embedding_model, chunks, batch_size=16)
-    docs_to_insert = []
-    for i, chunk_text in enumerate(chunks):
-        docs_to_insert.append({
-            "supplier_id": supplier_id,
-            "chunk_text": chunk_text,
-            "embedding": embs[i].tolist()
-        })
-    if docs_to_insert:
-        pipeline.collection.insert_many(docs_to_insert)
+    # Steps 2-3: Embed and upsert only new chunks in bounded batches, as a
+    # new version of this supplier's chunks. Unchanged re-uploads skip this.
+    doc_hash = hash_pdf(pdf_path)
+    current = get_current_document(pipeline.collection, supplier_id, doc_hash)
+    if current:
+        num_chunks = current["num_chunks"]
+    else:
+        stats = sync_supplier_chunks(
+            pipeline.embedding_model,
+            pipeline.collection,
+            supplier_id,
+            doc_hash,
+            chain(first_chunks, chunks),
+            batch_size=INGEST_BATCH_SIZE
+        )
+        num_chunks = stats["chunks"]
+        pipeline.vector_store.sync_supplier(pipeline.collection, supplier_id)
     
     # Step 4: Combine first few chunks into a snippet.
-    combined_text = " ".join(chunks[:3])
-    print("DEBUG: Combined text for detection and summary:", combined_text)
+    combined_text = " ".join(first_chunks)
     
     # Step 5: Detect roles.
     roles_detected = detect_roles_from_text(combined_text, openai_api_key, num_roles=5)
@@ -278,12 +305,13 @@ def ingest_supplier_pdf_with_summary(
     # Step 7: Generate a summary.
     summary_text = summarize_text(combined_text, openai_api_key, max_tokens=512)
     
-    print("DEBUG: Detected roles:", roles_detected)
-    print("DEBUG: Detected skills:", skills_detected)
-    print("DEBUG: Summary text:", summary_text)
+    log_info(
+        "SupplierPdfSummarized",
+        f"{supplier_id}: roles={roles_detected}, skills={skills_detected}, summary={len(summary_text or '')} chars"
+    )
     
     return {
-        "num_chunks": len(chunks),
+        "num_chunks": num_chunks,
         "detected_roles": roles_detected,
         "detected_skills": skills_detected,
         "summary": summary_text
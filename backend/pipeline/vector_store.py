@@ -0,0 +1,612 @@
+# pipeline/vector_store.py
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from itertools import chain
+
+import numpy as np
+
+from .chunk_store import active_versions, iter_active_chunks, unversioned_chunk_counts
+from .log_util import log_info, log_warning
+
+try:
+    import hnswlib
+except ImportError:  # exact search only
+    hnswlib = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves aren't serialized across processes
+    fcntl = None
+
+_MISSING = object()
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _cosine_to_score(cos):
+    # same scale as Atlas' vectorSearchScore for cosine indexes
+    return (1.0 + float(cos)) / 2.0
+
+
+class VectorStore:
+    """
+    Where the pipelines run their vector searches. search() returns hits as
+    {supplier_id, chunk_text, versions, score}, best first, with scores in
+    [0, 1] (higher is closer). With supplier_ids, only those suppliers'
+    chunks are candidates, so all top_k hits come from eligible suppliers.
+    With versions_by_supplier (chunk_store.active_versions of those
+    suppliers), only chunks of each supplier's active version are: suppliers
+    missing from it have no marker, and only their unversioned chunks count.
+
+    sync_supplier() is called after a supplier's chunks changed in Mongo;
+    stores that read Mongo directly have nothing to do there.
+    """
+
+    name = "base"
+
+    def search(self, q_emb, top_k=3, min_score=0.0, supplier_ids=None, versions_by_supplier=None):
+        raise NotImplementedError
+
+    async def search_async(self, q_emb, top_k=3, min_score=0.0, supplier_ids=None, versions_by_supplier=None):
+        return await asyncio.to_thread(self.search, q_emb, top_k, min_score, supplier_ids, versions_by_supplier)
+
+    def sync_supplier(self, collection, supplier_id: str):
+        pass
+
+    def delete_supplier(self, supplier_id: str):
+        pass
+
+    def save(self):
+        pass
+
+    def stats(self):
+        return {"backend": self.name}
+
+
+class AtlasVectorStore(VectorStore):
+    """
+    $vectorSearch on a MongoDB Atlas vector index over the chunks collection.
+
+    Supplier and version pre-filters run inside $vectorSearch, which needs
+    supplier_id and versions declared as filter fields of the index:
+        {"type": "filter", "path": "supplier_id"}, {"type": "filter", "path": "versions"}
+    """
+
+    name = "atlas"
+
+    def __init__(self, collection, index_name="default", async_collection_factory=None, num_candidates=50):
+        self.collection = collection
+        self.index_name = index_name
+        # returns the AsyncMongoClient collection; created lazily on the event loop
+        self.async_collection_factory = async_collection_factory
+        self.num_candidates = num_candidates
+
+    @staticmethod
+    def _filter(supplier_ids, versions_by_supplier):
+        if versions_by_supplier is None:
+            return {"supplier_id": {"$in": sorted(supplier_ids)}}
+        marked = sorted(s for s in supplier_ids if s in versions_by_supplier)
+        unmarked = sorted(s for s in supplier_ids if s not in versions_by_supplier)
+        clauses = []
+        if marked:
+            clauses.append({
+                "supplier_id": {"$in": marked},
+                "versions": {"$in": sorted({versions_by_supplier[s] for s in marked})},
+            })
+        if unmarked:
+            # not ingested with versions yet: their legacy chunks
+            clauses.append({"supplier_id": {"$in": unmarked}})
+        return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+    def _pipeline(self, q_emb, top_k, supplier_ids=None, versions_by_supplier=None):
+        q_emb = np.asarray(q_emb, dtype=np.float32).tolist()
+        vector_search = {
+            "index": self.index_name,
+            "queryVector": q_emb,
+            "path": "embedding",
+            "limit": top_k,
+            "numCandidates": max(self.num_candidates, top_k)
+        }
+        if supplier_ids is not None:
+            vector_search["filter"] = self._filter(supplier_ids, versions_by_supplier)
+        return [
+            {"$vectorSearch": vector_search},
+            {
+                "$project": {
+                    "_id": 0,
+                    "supplier_id": 1,
+                    "chunk_text": 1,
+                    "versions": 1,
+                    "score": {"$meta": "vectorSearchScore"}
+                }
+            }
+        ]
+
+    def search(self, q_emb, top_k=3, min_score=0.0, supplier_ids=None, versions_by_supplier=None):
+        if supplier_ids is not None and not supplier_ids:
+            return []
+        pipeline = self._pipeline(q_emb, top_k, supplier_ids, versions_by_supplier)
+        docs = list(self.collection.aggregate(pipeline))
+        return [d for d in docs if d["score"] >= min_score]
+
+    async def search_async(self, q_emb, top_k=3, min_score=0.0, supplier_ids=None, versions_by_supplier=None):
+        if supplier_ids is not None and not supplier_ids:
+            return []
+        if self.async_collection_factory is None:
+            return await super().search_async(q_emb, top_k, min_score, supplier_ids, versions_by_supplier)
+        pipeline = self._pipeline(q_emb, top_k, supplier_ids, versions_by_supplier)
+        cursor = await self.async_collection_factory().aggregate(pipeline)
+        docs = await cursor.to_list(None)
+        return [d for d in docs if d["score"] >= min_score]
+
+    def stats(self):
+        return {"backend": self.name, "index_name": self.index_name}
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector index for deployments without Atlas (local Mongo,
+    on-prem, tests).
+
+    Chunk embeddings are L2-normalized rows of one contiguous float32 matrix;
+    exact search is a single matrix-vector product plus argpartition. Once
+    the corpus reaches ann_threshold live rows (index_type="auto"), an HNSW
+    graph (hnswlib) is built over the same rows and answers queries instead.
+    A supplier-filtered search scores only the eligible suppliers' rows,
+    exactly while there are fewer than ann_threshold of them and through
+    the HNSW graph with a row filter beyond that.
+
+    Rows are added and removed per supplier: a removed row is only marked
+    dead, and the matrix is compacted once dead rows outnumber
+    compact_ratio of it. save() writes a snapshot directory (the matrix as
+    .npy) and load() maps it back read-only (np.load mmap_mode="r"), so a
+    large index opens without reading it all; the first write copies it
+    into memory.
+
+    Every supplier's rows remember the version they were loaded from. A
+    loaded snapshot may be older than Mongo (crash before save, another
+    worker's ingestions), so reconcile() re-syncs the suppliers whose
+    version changed; and a version-filtered search re-syncs a supplier whose
+    active version it hasn't loaded yet, when the store knows `collection`.
+    """
+
+    name = "local"
+
+    # `path` holds snapshot directories; CURRENT names the published one
+    CURRENT_FILE = "CURRENT"
+    LOCK_FILE = ".lock"
+    SNAPSHOT_PREFIX = "snapshot-"
+    MANIFEST_FILE = "manifest.json"
+    VECTORS_FILE = "vectors.npy"
+    ALIVE_FILE = "alive.npy"
+    ROWS_FILE = "rows.jsonl"
+    HNSW_FILE = "hnsw.bin"
+
+    def __init__(self, path=None, index_type="auto", ann_threshold=20000, compact_ratio=0.3,
+                 hnsw_m=16, hnsw_ef_construction=200, hnsw_ef=64, collection=None):
+        if index_type not in ("auto", "exact", "hnsw"):
+            raise ValueError(f"Unknown index_type '{index_type}' (expected auto, exact or hnsw)")
+        if index_type == "hnsw" and hnswlib is None:
+            raise ValueError("index_type 'hnsw' needs the hnswlib package")
+        self.path = path
+        self.index_type = index_type
+        self.ann_threshold = ann_threshold
+        self.compact_ratio = compact_ratio
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.hnsw_ef = hnsw_ef
+        # chunks collection, for re-syncing suppliers found stale by search()
+        self.collection = collection
+
+        self.dim = None
+        self._vectors = None              # (capacity, dim) float32, rows [0, _count) in use
+        self._alive = np.zeros(0, dtype=bool)
+        self._rows = []                   # row -> {supplier_id, chunk_text, versions}
+        self._rows_by_supplier = {}       # supplier_id -> [row, ...]
+        self._supplier_versions = {}      # supplier_id -> version their rows were loaded from
+        self._count = 0
+        self._dead = 0
+        self._hnsw = None
+        self._lock = threading.RLock()
+
+    # ---------- writes ----------
+
+    def _ensure_capacity(self, extra):
+        needed = self._count + extra
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        writable = self._vectors is not None and self._vectors.flags.writeable
+        if needed <= capacity and writable:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        vectors = np.empty((new_capacity, self.dim), dtype=np.float32)
+        alive = np.zeros(new_capacity, dtype=bool)
+        if self._count:
+            vectors[:self._count] = self._vectors[:self._count]
+            alive[:self._count] = self._alive[:self._count]
+        # searches hold views of the old arrays; they are replaced, never resized
+        self._vectors, self._alive = vectors, alive
+        if self._hnsw is not None and self._hnsw.get_max_elements() < new_capacity:
+            self._hnsw.resize_index(new_capacity)
+
+    def add(self, supplier_id: str, chunks, version=None):
+        """
+        Append a supplier's chunks ({chunk_text, embedding, versions?} dicts)
+        of their active `version` (None: unversioned chunks).
+        Returns the number of rows added.
+        """
+        chunks = [c for c in chunks if c.get("embedding") is not None]
+        if version is not None:
+            # remembered even without rows, so the supplier doesn't look stale
+            with self._lock:
+                self._supplier_versions[supplier_id] = version
+        if not chunks:
+            return 0
+        embeddings = _normalize([c["embedding"] for c in chunks])
+        with self._lock:
+            self._supplier_versions[supplier_id] = version
+            if self.dim is None:
+                self.dim = embeddings.shape[1]
+            elif embeddings.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {embeddings.shape[1]} does not match the index ({self.dim})")
+            self._ensure_capacity(len(chunks))
+            start, end = self._count, self._count + len(chunks)
+            self._vectors[start:end] = embeddings
+            self._alive[start:end] = True
+            for c in chunks:
+                self._rows.append({
+                    "supplier_id": supplier_id,
+                    "chunk_text": c.get("chunk_text"),
+                    "versions": c.get("versions"),
+                })
+            self._rows_by_supplier.setdefault(supplier_id, []).extend(range(start, end))
+            self._count = end
+            if self._hnsw is not None:
+                self._hnsw.add_items(embeddings, np.arange(start, end))
+            elif self._wants_hnsw():
+                self._build_hnsw()
+        return len(chunks)
+
+    def delete_supplier(self, supplier_id: str):
+        """
+        Remove every row of the supplier. Returns the number of rows removed.
+        """
+        with self._lock:
+            self._supplier_versions.pop(supplier_id, None)
+            rows = self._rows_by_supplier.pop(supplier_id, [])
+            if not rows:
+                return 0
+            self._alive[rows] = False
+            if self._hnsw is not None:
+                for row in rows:
+                    self._hnsw.mark_deleted(row)
+            self._dead += len(rows)
+            if self._dead > max(1024, self.compact_ratio * self._count):
+                self._compact()
+        return len(rows)
+
+    def replace_supplier(self, supplier_id: str, chunks, version=None):
+        with self._lock:
+            self.delete_supplier(supplier_id)
+            return self.add(supplier_id, chunks, version)
+
+    def sync_supplier(self, collection, supplier_id: str):
+        """
+        Reload the supplier's rows from the active version of their chunks in Mongo.
+        """
+        versions = active_versions(collection, [supplier_id])
+        chunks = list(iter_active_chunks(collection, supplier_id, versions))
+        added = self.replace_supplier(supplier_id, chunks, versions.get(supplier_id))
+        log_info("VectorStoreSupplierSynced", f"{supplier_id}: {added} rows")
+        return added
+
+    def build_from_collection(self, collection):
+        """
+        (Re)build the whole index from the active chunks in Mongo.
+        """
+        versions = active_versions(collection)
+        by_supplier = {}
+        for chunk in iter_active_chunks(collection, versions_by_supplier=versions):
+            by_supplier.setdefault(chunk["supplier_id"], []).append(chunk)
+        with self._lock:
+            self._reset()
+            for supplier_id, chunks in by_supplier.items():
+                self.add(supplier_id, chunks, versions.get(supplier_id))
+        log_info("VectorStoreBuilt", f"{self._count} rows, {len(by_supplier)} suppliers")
+        return self._count
+
+    def reconcile(self, collection):
+        """
+        Re-sync the suppliers whose chunks in Mongo differ from the rows
+        here: a different active version, new or removed suppliers, and for
+        unversioned suppliers a different chunk count. Returns their number.
+        """
+        versions = active_versions(collection)
+        unversioned = unversioned_chunk_counts(collection)
+        with self._lock:
+            loaded = dict(self._supplier_versions)
+            row_counts = {s: len(rows) for s, rows in self._rows_by_supplier.items()}
+        changed = {s for s, v in versions.items() if loaded.get(s, _MISSING) != v}
+        changed.update(
+            s for s, n in unversioned.items()
+            if s not in versions and (loaded.get(s, _MISSING) is not None or row_counts.get(s, 0) != n)
+        )
+        changed.update(s for s in loaded if s not in versions and s not in unversioned)
+        for supplier_id in changed:
+            self.sync_supplier(collection, supplier_id)
+        log_info("VectorStoreReconciled", f"{len(changed)} supplier(s) re-synced")
+        return len(changed)
+
+    def _reset(self):
+        self.dim = None
+        self._vectors = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._rows = []
+        self._rows_by_supplier = {}
+        self._supplier_versions = {}
+        self._count = self._dead = 0
+        self._hnsw = None
+
+    def _compact(self):
+        keep = np.flatnonzero(self._alive[:self._count])
+        capacity = max(len(keep) * 2, 1024)
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[:len(keep)] = self._vectors[keep]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(keep)] = True
+        rows = [self._rows[i] for i in keep]
+        by_supplier = {}
+        for new_row, row in enumerate(rows):
+            by_supplier.setdefault(row["supplier_id"], []).append(new_row)
+        self._vectors, self._alive, self._rows = vectors, alive, rows
+        self._rows_by_supplier = by_supplier
+        self._count, self._dead = len(keep), 0
+        self._hnsw = None
+        if self._wants_hnsw():
+            self._build_hnsw()
+        log_info("VectorStoreCompacted", f"{self._count} rows kept")
+
+    # ---------- HNSW ----------
+
+    def _live_count(self):
+        return self._count - self._dead
+
+    def _wants_hnsw(self):
+        if hnswlib is None or self.index_type == "exact":
+            return False
+        return self.index_type == "hnsw" or self._live_count() >= self.ann_threshold
+
+    def _build_hnsw(self):
+        index = hnswlib.Index(space="cosine", dim=self.dim)
+        index.init_index(
+            max_elements=self._vectors.shape[0],
+            ef_construction=self.hnsw_ef_construction,
+            M=self.hnsw_m,
+            allow_replace_deleted=False,
+        )
+        live = np.flatnonzero(self._alive[:self._count])
+        if len(live):
+            index.add_items(self._vectors[live], live)
+        index.set_ef(self.hnsw_ef)
+        self._hnsw = index
+        log_info("VectorStoreHNSWBuilt", f"{len(live)} rows")
+
+    # ---------- reads ----------
+
+    def search(self, q_emb, top_k=3, min_score=0.0, supplier_ids=None, versions_by_supplier=None):
+        q = _normalize(q_emb).reshape(-1)
+        if versions_by_supplier and self.collection is not None:
+            # ingested by another worker since this index was loaded
+            for supplier_id in [
+                s for s, v in versions_by_supplier.items()
+                if (supplier_ids is None or s in supplier_ids) and self._supplier_versions.get(s) != v
+            ]:
+                self.sync_supplier(self.collection, supplier_id)
+        with self._lock:
+            if versions_by_supplier is not None:
+                # rows loaded from an older version than the supplier's active
+                # one (not re-synced yet in this process) aren't candidates
+                if supplier_ids is None:
+                    supplier_ids = list(self._rows_by_supplier)
+                supplier_ids = [
+                    s for s in supplier_ids
+                    if s in self._rows_by_supplier
+                    and self._supplier_versions.get(s) == versions_by_supplier.get(s)
+                ]
+            if supplier_ids is None:
+                candidates = None
+                live = self._live_count()
+            else:
+                # the eligible suppliers' rows are the only candidates
+                candidates = np.fromiter(
+                    chain.from_iterable(self._rows_by_supplier.get(s, ()) for s in supplier_ids),
+                    dtype=np.int64,
+                )
+                live = len(candidates)
+            if not live or top_k <= 0:
+                return []
+            k = min(top_k, live)
+            rows = self._rows
+            if self._hnsw is not None and (candidates is None or live >= self.ann_threshold):
+                # queried under the lock: hnswlib isn't safe against a
+                # concurrent resize_index / mark_deleted
+                self._hnsw.set_ef(max(self.hnsw_ef, k))
+                row_filter = None
+                if candidates is not None:
+                    eligible = set(candidates.tolist())
+                    row_filter = eligible.__contains__
+                try:
+                    labels, distances = self._hnsw.knn_query(q, k=k, filter=row_filter)
+                except RuntimeError as e:
+                    # too few reachable rows for k (many deletions): exact search below
+                    log_warning("VectorStoreHNSWQueryFailed", str(e))
+                else:
+                    hits = [(int(row), 1.0 - float(d)) for row, d in zip(labels[0], distances[0])]
+                    return self._to_docs(rows, hits, min_score)
+            # views of the current arrays: later writes replace them instead
+            # of resizing in place, so the product below runs unlocked
+            vectors = self._vectors[:self._count]
+            alive = self._alive[:self._count].copy() if candidates is None else None
+
+        if candidates is None:
+            sims = vectors @ q
+            sims[~alive] = -np.inf
+        else:
+            sims = vectors[candidates] @ q
+        top = np.argpartition(-sims, k - 1)[:k] if k < len(sims) else np.arange(len(sims))
+        top = top[np.argsort(-sims[top], kind="stable")]
+        row_ids = top if candidates is None else candidates[top]
+        return self._to_docs(rows, [(int(row), sims[i]) for row, i in zip(row_ids, top)], min_score)
+
+    @staticmethod
+    def _to_docs(rows, hits, min_score):
+        docs = []
+        for row, cos in hits:
+            score = _cosine_to_score(cos)
+            if score < min_score:
+                continue
+            doc = dict(rows[row])
+            doc["score"] = score
+            docs.append(doc)
+        return docs
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.name,
+                "index": "hnsw" if self._hnsw is not None else "exact",
+                "dim": self.dim,
+                "rows": self._live_count(),
+                "dead_rows": self._dead,
+                "suppliers": len(self._rows_by_supplier),
+                "capacity": 0 if self._vectors is None else int(self._vectors.shape[0]),
+                "memory_mapped": isinstance(self._vectors, np.memmap),
+                "path": self.path,
+            }
+
+    # ---------- persistence ----------
+
+    def save(self, path=None):
+        """
+        Write the index as a new snapshot directory under `path` (manifest,
+        vectors.npy, alive.npy, rows.jsonl and, when built, hnsw.bin), then
+        publish it by atomically replacing the CURRENT pointer file. A crash
+        mid-save leaves the previous snapshot published; older snapshots are
+        removed afterwards. Saves of several workers are serialized with a
+        lock file and the last one wins, which reconcile() makes harmless.
+        """
+        path = path or self.path
+        if not path:
+            return
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, self.LOCK_FILE), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            snapshot = tempfile.mkdtemp(prefix=self.SNAPSHOT_PREFIX, dir=path)
+            try:
+                with self._lock:
+                    count = self._write_snapshot(snapshot)
+                current_tmp = os.path.join(path, f"{self.CURRENT_FILE}.{uuid.uuid4().hex}.tmp")
+                with open(current_tmp, "w") as f:
+                    f.write(os.path.basename(snapshot))
+                os.replace(current_tmp, os.path.join(path, self.CURRENT_FILE))
+            except BaseException:
+                shutil.rmtree(snapshot, ignore_errors=True)
+                raise
+            self._remove_old_snapshots(path, os.path.basename(snapshot))
+        log_info("VectorStoreSaved", f"{snapshot}: {count} rows")
+
+    def _write_snapshot(self, snapshot):
+        if self._count:
+            np.save(os.path.join(snapshot, self.VECTORS_FILE), self._vectors[:self._count])
+            np.save(os.path.join(snapshot, self.ALIVE_FILE), self._alive[:self._count])
+        with open(os.path.join(snapshot, self.ROWS_FILE), "wb") as f:
+            for row in self._rows:
+                f.write(json.dumps(row, ensure_ascii=False).encode("utf-8") + b"\n")
+        if self._hnsw is not None:
+            self._hnsw.save_index(os.path.join(snapshot, self.HNSW_FILE))
+        manifest = {"rows": self._count, "dim": self.dim, "suppliers": self._supplier_versions}
+        with open(os.path.join(snapshot, self.MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f)
+        return self._count
+
+    def _remove_old_snapshots(self, path, keep):
+        for name in os.listdir(path):
+            if name.startswith(self.SNAPSHOT_PREFIX) and name != keep:
+                # files still mapped by another worker stay readable on POSIX;
+                # on Windows they can't be removed yet and are retried next save
+                shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+    def load(self, path=None):
+        """
+        Open the snapshot published under `path`. Returns False when there
+        is none. The caller should reconcile() it with Mongo afterwards.
+        """
+        path = path or self.path
+        current_file = os.path.join(path, self.CURRENT_FILE) if path else None
+        if not current_file or not os.path.exists(current_file):
+            return False
+        with open(current_file) as f:
+            snapshot = os.path.join(path, f.read().strip())
+        with open(os.path.join(snapshot, self.MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        with open(os.path.join(snapshot, self.ROWS_FILE), "rb") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        with self._lock:
+            self._reset()
+            if rows:
+                self._vectors = np.load(os.path.join(snapshot, self.VECTORS_FILE), mmap_mode="r")
+                self._alive = np.load(os.path.join(snapshot, self.ALIVE_FILE))
+                self.dim = self._vectors.shape[1]
+            self._rows = rows
+            for i, row in enumerate(rows):
+                if self._alive[i]:
+                    self._rows_by_supplier.setdefault(row["supplier_id"], []).append(i)
+            self._supplier_versions = dict(manifest.get("suppliers", {}))
+            self._count = len(rows)
+            self._dead = self._count - int(self._alive[:self._count].sum())
+            hnsw_file = os.path.join(snapshot, self.HNSW_FILE)
+            if rows and hnswlib is not None and os.path.exists(hnsw_file):
+                self._hnsw = hnswlib.Index(space="cosine", dim=self.dim)
+                self._hnsw.load_index(hnsw_file, max_elements=self._count)
+                self._hnsw.set_ef(self.hnsw_ef)
+            elif rows and self._wants_hnsw():
+                self._build_hnsw()
+        log_info("VectorStoreLoaded", f"{snapshot}: {self._live_count()} rows")
+        return True
+
+
+def open_local_vector_store(collection, path=None, index_type="auto", ann_threshold=20000,
+                            hnsw_m=16, hnsw_ef_construction=200, hnsw_ef=64):
+    """
+    LocalVectorStore opened from the snapshot saved under `path` and
+    reconciled with `collection`, or built from the active chunks in
+    `collection` when there is none.
+    """
+    store = LocalVectorStore(
+        path=path,
+        index_type=index_type,
+        ann_threshold=ann_threshold,
+        hnsw_m=hnsw_m,
+        hnsw_ef_construction=hnsw_ef_construction,
+        hnsw_ef=hnsw_ef,
+        collection=collection,
+    )
+    try:
+        if store.load():
+            store.reconcile(collection)
+        else:
+            store.build_from_collection(collection)
+    except Exception as e:
+        # start empty rather than not at all; ingestions fill it back in
+        log_warning("VectorStoreInitFailed", str(e))
+    return store
@@ -1,8 +1,10 @@
 import uuid
 from sqlalchemy.orm import Session
 from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 import models, schemas
-from typing import Optional, List
+from service_catalog import service_catalog
+from typing import Optional, List, Dict, Union
 import utils
 
 # ------------------------
@@ -52,6 +54,36 @@ def get_user(db: Session, user_id: str):
     """
     return db.query(models.User).filter(models.User.id == user_id).first()
 
+def get_user_by_username(db: Session, username: str):
+    """
+    Retrieve a user by their username.
+
+    Args:
+        db (Session): The database session.
+        username (str): The username.
+
+    Returns:
+        models.User: The retrieved user, or None.
+    """
+    return db.query(models.User).filter(models.User.username == username).first()
+
+def get_users_by_ids(db: Session, user_ids: List[str]) -> Dict[str, models.User]:
+    """
+    Retrieve several users in one query.
+
+    Args:
+        db (Session): The database session.
+        user_ids (List[str]): The user IDs (duplicates are fine).
+
+    Returns:
+        Dict[str, models.User]: Users keyed by ID; unknown IDs are absent.
+    """
+    ids = set(user_ids)
+    if not ids:
+        return {}
+    users = db.query(models.User).filter(models.User.id.in_(ids)).all()
+    return {u.id: u for u in users}
+
 def login_user(db: Session, username: str, password: str):
     """
     Authenticate a user using username and password.
@@ -258,6 +290,8 @@ def create_review(db: Session, review: schemas.ReviewCreate):
         review=review.review
     )
     db.add(db_review)
+    # keep the supplier's rating aggregate in the same transaction
+    _add_to_rating_summary(db, review.supplier_id, review.rating)
     db.commit()
     db.refresh(db_review)
     return db_review
@@ -275,12 +309,113 @@ def get_review(db: Session, review_id: str):
     """
     return db.query(models.Review).filter(models.Review.id == review_id).first()
 
+# Bayesian smoothing for supplier ratings: every supplier starts with
+# RATING_PRIOR_WEIGHT virtual reviews of RATING_PRIOR_MEAN stars.
+RATING_PRIOR_MEAN = 3.5
+RATING_PRIOR_WEIGHT = 5
+
+def _set_rating_scores(summary: models.SupplierRatingSummary):
+    count = summary.review_count or 0
+    total = summary.rating_sum or 0
+    summary.avg_rating = float(total) / count if count else 0.0
+    summary.bayesian_rating = (RATING_PRIOR_MEAN * RATING_PRIOR_WEIGHT + total) / (RATING_PRIOR_WEIGHT + count)
+
+def _add_to_rating_summary(db: Session, supplier_id: str, rating: int):
+    """
+    Incrementally fold one new rating into the supplier's summary row.
+    The UPDATE ... SET count = count + 1 holds the row lock until commit,
+    so concurrent reviews for the same supplier don't lose increments.
+    A review without a rating doesn't count towards the average.
+    """
+    Summary = models.SupplierRatingSummary
+    if rating is None:
+        return db.get(Summary, supplier_id)
+    updated = db.query(Summary).filter(Summary.supplier_id == supplier_id).update(
+        {
+            Summary.review_count: Summary.review_count + 1,
+            Summary.rating_sum: Summary.rating_sum + rating,
+        },
+        synchronize_session=False,
+    )
+    if not updated:
+        try:
+            # savepoint, so losing an insert race doesn't roll back the review
+            with db.begin_nested():
+                db.add(Summary(supplier_id=supplier_id, review_count=1, rating_sum=rating))
+        except IntegrityError:
+            db.query(Summary).filter(Summary.supplier_id == supplier_id).update(
+                {
+                    Summary.review_count: Summary.review_count + 1,
+                    Summary.rating_sum: Summary.rating_sum + rating,
+                },
+                synchronize_session=False,
+            )
+    summary = db.get(Summary, supplier_id, populate_existing=True)
+    _set_rating_scores(summary)
+    return summary
+
+def get_supplier_rating_summary(db: Session, supplier_id: str) -> Optional[models.SupplierRatingSummary]:
+    """
+    Retrieve the materialized rating aggregate of a supplier (primary-key lookup).
+    """
+    return db.get(models.SupplierRatingSummary, supplier_id)
+
 def get_supplier_avg_rating(db: Session, supplier_id: str) -> float:
-    res = db.query(func.avg(models.Review.rating)).filter(models.Review.supplier_id == supplier_id).first()
-    if res and res[0]:
-        return float(res[0])
+    summary = get_supplier_rating_summary(db, supplier_id)
+    if summary and summary.avg_rating:
+        return float(summary.avg_rating)
     return 0.0
 
+def get_supplier_avg_ratings(db: Session, supplier_ids: List[str]) -> Dict[str, float]:
+    """
+    Average rating of several suppliers in one IN query on the rating summaries.
+
+    Returns:
+        Dict[str, float]: supplier_id -> average rating, 0.0 for suppliers without reviews.
+    """
+    ids = set(supplier_ids)
+    if not ids:
+        return {}
+    rows = (
+        db.query(models.SupplierRatingSummary.supplier_id, models.SupplierRatingSummary.avg_rating)
+        .filter(models.SupplierRatingSummary.supplier_id.in_(ids))
+        .all()
+    )
+    ratings = {sup_id: 0.0 for sup_id in ids}
+    for sup_id, avg in rows:
+        if avg:
+            ratings[sup_id] = float(avg)
+    return ratings
+
+def rebuild_supplier_rating_summaries(db: Session) -> int:
+    """
+    Recompute every supplier's rating summary from the reviews table
+    (backfill after deploying the summaries, or repair after manual edits).
+
+    Returns:
+        int: Number of suppliers with a summary row.
+    """
+    rows = (
+        db.query(
+            models.Review.supplier_id,
+            func.count(models.Review.id),
+            func.sum(models.Review.rating),
+        )
+        # reviews without a rating aren't counted (see _add_to_rating_summary)
+        .filter(models.Review.supplier_id.isnot(None), models.Review.rating.isnot(None))
+        .group_by(models.Review.supplier_id)
+        .all()
+    )
+    db.query(models.SupplierRatingSummary).delete(synchronize_session=False)
+    for supplier_id, count, total in rows:
+        summary = models.SupplierRatingSummary(
+            supplier_id=supplier_id, review_count=int(count), rating_sum=int(total)
+        )
+        _set_rating_scores(summary)
+        db.add(summary)
+    db.commit()
+    return len(rows)
+
 # ------------------------
 # Services
 # ------------------------
@@ -304,6 +439,7 @@ def create_service(db: Session, service: schemas.ServiceCreate):
     )
     db.add(db_service)
     db.commit()
+    service_catalog.invalidate()
     db.refresh(db_service)
     return db_service
 
@@ -324,14 +460,15 @@ def get_service_by_name(db: Session, name: str) -> Optional[models.Service]:
     return db.query(models.Service).filter(models.Service.name == name.lower()).first()
 
 def get_suppliers_for_service(db: Session, service_name: str):
-    # 1) Get the service object by name
-    svc = get_service_by_name(db, service_name)
-    if not svc:
-        return []
-    # 2) Find all association rows for that service
-    rows = db.query(models.SupplierService).filter_by(service_id=svc.id).all()
-    # 3) Collect the supplier_ids
-    supplier_ids = [row.supplier_id for row in rows]
+    # Join the association rows to the service by name in a single query;
+    # an unknown service simply yields no rows.
+    rows = (
+        db.query(models.SupplierService.supplier_id)
+        .join(models.Service, models.Service.id == models.SupplierService.service_id)
+        .filter(models.Service.name == service_name.lower())
+        .all()
+    )
+    supplier_ids = [row[0] for row in rows]
     return supplier_ids
 
 def list_services_for_supplier(db: Session, supplier_id: str):
@@ -360,22 +497,64 @@ def link_supplier_service(db: Session, supplier_id: str, service_id: str) -> mod
     )
     db.add(association)
     db.commit()
+    service_catalog.invalidate()
     db.refresh(association)
     return association
 
-def store_and_link_service(db: Session, supplier_id: str, role_name: str):
-    # 1) Normalize the role name if needed
-    role_name = role_name.strip().lower()
+def _normalize_role_names(role_names: List[str]) -> List[str]:
+    # lowercase, trimmed, de-duplicated, first-seen order
+    names = (name.strip().lower() for name in role_names if name)
+    return list(dict.fromkeys(name for name in names if name))
 
-    # 2) Check if service already exists
-    existing_svc = get_service_by_name(db, role_name)
-    if not existing_svc:
-        # create new service
-        svc_create = schemas.ServiceCreate(name=role_name, description="")
-        existing_svc = create_service(db, svc_create)
+def _insert_ignoring_conflicts(dialect_name: str, model, rows: List[dict], conflict_columns: List[str]):
+    """
+    INSERT ... ON CONFLICT (conflict_columns) DO NOTHING for Postgres and sqlite.
+    """
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(model).values(rows).on_conflict_do_nothing(index_elements=conflict_columns)
+
+def _service_rows(names: List[str]) -> List[dict]:
+    return [{"id": utils.generate_uuid(), "name": name, "description": ""} for name in names]
+
+def _link_rows(supplier_id: str, services) -> List[dict]:
+    return [{"supplier_id": supplier_id, "service_id": svc.id} for svc in services]
+
+def store_and_link_services(db: Session, supplier_id: str, role_names: List[str]) -> List[models.Service]:
+    """
+    Make sure a service exists for each role name and link all of them to the
+    supplier, in one transaction: missing services and links are inserted with
+    ON CONFLICT DO NOTHING (so concurrent ingestions can't collide), the names
+    are resolved in one query, and there is a single commit.
+
+    Returns:
+        List[models.Service]: The services, in the order of role_names.
+    """
+    names = _normalize_role_names(role_names)
+    if not names:
+        return []
+    dialect_name = db.get_bind().dialect.name
+    db.execute(_insert_ignoring_conflicts(dialect_name, models.Service, _service_rows(names), ["name"]))
+    by_name = {
+        svc.name: svc
+        for svc in db.query(models.Service).filter(models.Service.name.in_(names)).all()
+    }
+    services = [by_name[name] for name in names if name in by_name]
+    db.execute(
+        _insert_ignoring_conflicts(
+            dialect_name, models.SupplierService, _link_rows(supplier_id, services), ["supplier_id", "service_id"]
+        )
+    )
+    db.commit()
+    service_catalog.invalidate()
+    return services
 
-    # 3) Link service to supplier
-    link_supplier_service(db, supplier_id, existing_svc.id)
+def store_and_link_service(db: Session, supplier_id: str, role_name: Union[str, List[str]]):
+    # A single role or a list of roles; either way one bulk upsert and one commit
+    role_names = [role_name] if isinstance(role_name, str) else role_name
+    return store_and_link_services(db, supplier_id, role_names)
 # ------------------------
 # Supplier Services (Association)
 # ------------------------
@@ -399,6 +578,7 @@ def add_supplier_service(db: Session, supplier_id: int, service_id: int):
     )
     db.add(db_supplier_service)
     db.commit()
+    service_catalog.invalidate()
     db.refresh(db_supplier_service)
     return db_supplier_service
 
@@ -1,12 +1,30 @@
+import json
 from fastapi import FastAPI, Depends, HTTPException, File, UploadFile, Body
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pipeline.supplier_pdf_ingestion import ingest_supplier_pdf, ingest_supplier_pdf_with_summary
 
 
-import repository, schemas
+import repository, async_repository, schemas
 from schemas import SearchRequest
-from database import SessionLocal, Base, engine
+from database import SessionLocal, Base, engine, get_pool_stats
+from async_database import AsyncSessionLocal, async_engine, get_async_pool_stats
+from config import (
+    embedding_cache_size, embedding_cache_ttl,
+    llm_cache_size, llm_cache_ttl, llm_cache_path,
+    summary_concurrency, summary_timeout, summary_mode,
+    ingest_workers, ingest_max_embedding_jobs, ingest_max_attempts,
+    ingest_retry_backoff, ingest_queue_path,
+    pdf_extract_workers, pdf_parallel_min_pages,
+    vector_store_backend, vector_index_path, vector_index_type, vector_ann_threshold,
+    hnsw_m, hnsw_ef_construction, hnsw_ef,
+)
+from ingestion_queue import IngestionQueue
+from migrations import check_required_indexes
+from uploads import save_upload_to_tempfile, UploadTooLarge
 
 # Create the tables in the database
 Base.metadata.create_all(bind=engine)
@@ -18,6 +36,10 @@ app = FastAPI()
 from dotenv import load_dotenv
 import os
 from pipeline.enhance_rag_pipeline import EnhancedRAGPipeline
+from pipeline.embedding_utils import preload_embedding_models, get_model_registry_stats
+from pipeline.llm_cache import configure_llm_cache, get_llm_cache
+from pipeline.chunking_utils import configure_pdf_extraction
+from pipeline.vector_store import open_local_vector_store
 from pipeline.log_util import log_info, log_event
 load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
@@ -27,12 +49,98 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 def db_session_factory():
     return SessionLocal()
 
-# Create the advanced pipeline
-rag_pipeline = EnhancedRAGPipeline(
-    mongo_uri=MONGO_URI,
-    openai_api_key=OPENAI_API_KEY,
-    db_session_factory=db_session_factory
+# Warm start: load the embedding model once at import time, so a pre-forking
+# server (e.g. gunicorn --preload) shares it copy-on-write across workers.
+preload_embedding_models()
+
+# Cache LLM routing / decomposition / rewriting answers in memory + SQLite
+configure_llm_cache(maxsize=llm_cache_size, ttl_seconds=llm_cache_ttl, sqlite_path=llm_cache_path or None)
+
+# Chunk the pages of long PDFs in a process pool
+configure_pdf_extraction(workers=pdf_extract_workers, min_pages=pdf_parallel_min_pages)
+
+if vector_store_backend not in ("atlas", "local"):
+    raise ValueError(f"Unknown VECTOR_STORE '{vector_store_backend}' (expected atlas or local)")
+
+def _create_rag_pipeline():
+    pipeline = EnhancedRAGPipeline(
+        mongo_uri=MONGO_URI,
+        openai_api_key=OPENAI_API_KEY,
+        db_session_factory=db_session_factory,
+        embedding_cache_size=embedding_cache_size,
+        embedding_cache_ttl=embedding_cache_ttl,
+        summary_concurrency=summary_concurrency,
+        summary_timeout=summary_timeout,
+        summary_mode=summary_mode
+    )
+    # Vector search: Atlas $vectorSearch by default; plain MongoDB (no
+    # $vectorSearch) uses an in-process index, saved to disk at shutdown
+    if vector_store_backend == "local":
+        pipeline.vector_store = open_local_vector_store(
+            pipeline.collection,
+            path=vector_index_path or None,
+            index_type=vector_index_type,
+            ann_threshold=vector_ann_threshold,
+            hnsw_m=hnsw_m,
+            hnsw_ef_construction=hnsw_ef_construction,
+            hnsw_ef=hnsw_ef
+        )
+    return pipeline
+
+# The advanced pipeline, created per worker at startup: its MongoClient (and
+# the local index loaded through it) must not be inherited across the fork
+# of a pre-forking server
+rag_pipeline = None
+
+@app.on_event("startup")
+def create_rag_pipeline():
+    global rag_pipeline
+    rag_pipeline = _create_rag_pipeline()
+
+# Background ingestion of uploaded PDFs
+def _ingest_job(job, embedding_slots):
+    db = SessionLocal()
+    try:
+        return ingest_supplier_pdf(
+            db=db,
+            pipeline=rag_pipeline,
+            pdf_path=job["pdf_path"],
+            supplier_id=job["supplier_id"],
+            openai_api_key=OPENAI_API_KEY,
+            embedding_slots=embedding_slots
+        )
+    finally:
+        db.close()
+
+ingestion_queue = IngestionQueue(
+    _ingest_job,
+    sqlite_path=ingest_queue_path,
+    workers=ingest_workers,
+    max_embedding_jobs=ingest_max_embedding_jobs,
+    max_attempts=ingest_max_attempts,
+    retry_backoff=ingest_retry_backoff
 )
+
+# create_all doesn't add indexes to existing tables; ingestion needs
+# the unique ones from `python manage.py migrate`
+@app.on_event("startup")
+def check_schema():
+    check_required_indexes(engine)
+
+@app.on_event("startup")
+def start_ingestion_queue():
+    ingestion_queue.start()
+
+@app.on_event("shutdown")
+def stop_ingestion_queue():
+    ingestion_queue.stop()
+
+# after the queue has stopped, so no ingestion writes to the index mid-save
+@app.on_event("shutdown")
+def save_vector_store():
+    if rag_pipeline is not None:
+        rag_pipeline.vector_store.save()
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -50,6 +158,51 @@ def get_db() -> Session:
     finally:
         db.close()
 
+# Dependency to get an async DB session, for handlers running on the event loop
+async def get_async_db() -> AsyncSession:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    await async_engine.dispose()
+
+@app.get("/embedding_models/stats")
+def embedding_model_stats():
+    """
+    Load time and resident memory of the embedding models in this worker.
+    """
+    return get_model_registry_stats()
+
+@app.get("/embedding_cache/stats")
+def embedding_cache_stats():
+    """
+    Hit/miss counters of the query-embedding cache in this worker.
+    """
+    return rag_pipeline.embedding_cache.stats()
+
+@app.get("/db_pool/stats")
+def db_pool_stats():
+    """
+    Connection pool checkouts, wait times and current usage in this worker,
+    for the sync engine and the async one the search endpoints use.
+    """
+    return {"sync": get_pool_stats(), "async": get_async_pool_stats()}
+
+@app.get("/llm_cache/stats")
+def llm_cache_stats():
+    """
+    Hit/miss counters of the LLM response cache in this worker.
+    """
+    return get_llm_cache().stats()
+
+@app.get("/vector_store/stats")
+def vector_store_stats():
+    """
+    Backend and size of the vector index used by searches in this worker.
+    """
+    return rag_pipeline.vector_store.stats()
+
 # ------------------------
 # Users Endpoints
 # ------------------------
@@ -58,7 +211,17 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     """
     Create a new user.
     """
-    return repository.create_user(db=db, user=user)
+    if repository.get_user_by_username(db, user.username):
+        raise HTTPException(status_code=400, detail="Username already taken")
+    try:
+        return repository.create_user(db=db, user=user)
+    except IntegrityError:
+        db.rollback()
+        # taken by a concurrent signup since the check; any other violation
+        # is not the client's username
+        if repository.get_user_by_username(db, user.username):
+            raise HTTPException(status_code=400, detail="Username already taken")
+        raise
 
 @app.post("/login", response_model=schemas.User)
 def login(login_request: schemas.UserLogin, db: Session = Depends(get_db)):
@@ -83,7 +246,7 @@ def get_user(user_id: str, db: Session = Depends(get_db)):
 # ------------------------
 # Suppliers Endpoints
 # ------------------------
-@app.post("/suppliers/{supplier_id}/upload_pdf")
+@app.post("/suppliers/{supplier_id}/upload_pdf", status_code=202)
 def upload_pdf_for_supplier(
     supplier_id: str,
     file: UploadFile = File(...),
@@ -91,27 +254,43 @@ def upload_pdf_for_supplier(
 ):
     """
     1) Save PDF locally
-    2) Ingest -> chunk + embed in Mongo + auto-detect roles + store in Postgres
+    2) Queue ingestion (chunk + embed in Mongo + auto-detect roles + store in
+       Postgres) on the background workers and return the job right away.
+       Poll GET /ingestion_jobs/{job_id} for its status.
     """
     # Check if supplier exists
     sup = repository.get_user(db, supplier_id)
     if not sup or not sup.is_supplier:
         raise HTTPException(400, "User is not a supplier")
 
-    temp_path = f"/tmp/{file.filename}"
-    with open(temp_path, "wb") as f:
-        f.write(file.file.read())
+    # the temp file outlives the request; the queue deletes it when the job is done
+    temp_path = _save_upload(file)
+    try:
+        job = ingestion_queue.submit(supplier_id, temp_path)
+    except Exception:
+        # never queued: nothing else will delete it
+        os.remove(temp_path)
+        raise
+    return {"detail": "PDF uploaded, ingestion queued", "supplier_id": supplier_id, "job_id": job["id"], "status": job["status"]}
 
-    # Call advanced ingestion
-    msg = ingest_supplier_pdf(
-        db=db,
-        pipeline=rag_pipeline,
-        pdf_path=temp_path,
-        supplier_id=supplier_id,
-        openai_api_key=OPENAI_API_KEY
-    )
+@app.get("/ingestion_jobs/stats")
+def ingestion_job_stats():
+    """
+    Job counts by status and the queue settings.
+    """
+    return ingestion_queue.stats()
 
-    return {"detail": "PDF uploaded & embedded", "supplier_id": supplier_id, "info": msg}
+@app.get("/ingestion_jobs/{job_id}")
+def get_ingestion_job(job_id: str):
+    """
+    Status of a PDF ingestion job: queued, running, succeeded (with the
+    ingestion result), failed (with the last error) or superseded by a newer
+    upload from the same supplier.
+    """
+    job = ingestion_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job
 
 @app.post("/suppliers/{supplier_id}/upload_pdf_summary")
 def upload_pdf_summary_for_supplier(
@@ -120,75 +299,54 @@ def upload_pdf_summary_for_supplier(
     db: Session = Depends(get_db)
 ):
     # Save the file temporarily.
-    temp_path = f"/tmp/{file.filename}"
-    with open(temp_path, "wb") as f:
-        f.write(file.file.read())
-    
-    # Call the ingestion function that produces a summary (no Postgres updates)
-    result = ingest_supplier_pdf_with_summary(
-        pdf_path=temp_path,
-        supplier_id=supplier_id,
-        openai_api_key=OPENAI_API_KEY,
-        pipeline=rag_pipeline
-    )
+    temp_path = _save_upload(file)
+    try:
+        # Call the ingestion function that produces a summary (no Postgres updates)
+        result = ingest_supplier_pdf_with_summary(
+            pdf_path=temp_path,
+            supplier_id=supplier_id,
+            openai_api_key=OPENAI_API_KEY,
+            pipeline=rag_pipeline
+        )
+    finally:
+        os.remove(temp_path)
     return result
+
+def _save_upload(file: UploadFile) -> str:
+    """
+    Stream the upload to a unique temp file, enforcing MAX_UPLOAD_BYTES.
+    """
+    try:
+        return save_upload_to_tempfile(file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
 # ---------- Search for Supplier (AI-Assisted) ----------
 @app.post("/search_for_supplier")
-def search_for_supplier(
+async def search_for_supplier(
     payload: SearchRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     1) do a vector search in Mongo
     2) if no match => create an open post
     3) if match => return them sorted
+
+    Runs on the event loop: LLM, Mongo and Postgres calls are all awaited.
     """
     query = payload.query
-    requester_id = payload.requester_id
-     # 1) advanced pipeline search
-    chunk_matches = rag_pipeline.advanced_search(user_query=query, top_k=5)
-    if not chunk_matches:
-        # no direct match => fallback open post
-        new_post_data = schemas.PostCreate(
-            title=f"Request from advanced search: {query[:30]}",
-            description=query,
-            category="general",
-            status="open",
-            requester_id=requester_id
-        )
-        new_post = repository.create_post(db, new_post_data)
-        return {
-            "results": [],
-            "summary": "No direct matches found. Created an open request.",
-            "post_id": new_post.id
-        }
-
-    # 2) build final results
-    # chunk_matches is a list of e.g. {"supplier_id":..., "chunk_text":..., "score":...}
+    matched, no_match_response = await _search_matches(payload, db)
+    if no_match_response:
+        return no_match_response
+
+    # 2.5) Doc-level summaries: each GPT call only sees its own chunk doc.
+    # They run in parallel (bounded); a failed or slow one comes back as None.
+    summaries = await rag_pipeline.get_structured_summaries_async(query, [m for m, _, _ in matched])
+
     results_list = []
-    for m in chunk_matches:
-        if "supplier_id" not in m:
-            # Skip documents without a supplier_id
-            print("DEBUG: Document missing supplier_id:", m)
-            continue
-        sp_id = m["supplier_id"]
-        sp_user = repository.get_user(db, sp_id)
-        if not sp_user:
-            continue
-        rating = repository.get_supplier_avg_rating(db, sp_id)
-        
-        # 2.5) For doc-level summary, pass [match_doc] to get_structured_summary
-        # so it only uses that single chunk doc as 'context' for GPT:
-        doc_summary = rag_pipeline.get_structured_summary(query, [m])  # pass a list of 1 doc
-
-        results_list.append({
-            "supplier_id": sp_id,
-            "username": sp_user.username,
-            "score": m["score"],
-            "rating": rating,
-            # "chunk_text": m["chunk_text"]
-            "structured_summary": doc_summary
-        })
+    for (m, sp_user, rating), doc_summary in zip(matched, summaries):
+        result = _match_result(m, sp_user, rating)
+        result["structured_summary"] = doc_summary
+        results_list.append(result)
     
     print("DEBUG: Final supplier matches amount:", len(results_list))
     # 3) Optionally call structured summary 
@@ -201,6 +359,104 @@ def search_for_supplier(
         "report": "Found matches for the query."
     }
 
+@app.post("/search_for_supplier/stream")
+async def search_for_supplier_stream(
+    payload: SearchRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Streaming variant of /search_for_supplier (NDJSON, one event per line):
+      {"type": "results", "results": [...]}     ranked suppliers, right after retrieval
+      {"type": "summary", "supplier_id": ..., "structured_summary": ...}  as each completes
+      {"type": "done"}
+    If nothing matches, a single {"type": "no_match", ...} event carries the new post_id.
+    """
+    query = payload.query
+    matched, no_match_response = await _search_matches(payload, db)
+
+    async def events():
+        if no_match_response:
+            yield json.dumps({"type": "no_match", **no_match_response}) + "\n"
+            return
+        results_list = [_match_result(m, sp_user, rating) for m, sp_user, rating in matched]
+        yield json.dumps({"type": "results", "results": results_list}) + "\n"
+
+        matches = [m for m, _, _ in matched]
+        async for i, doc_summary in rag_pipeline.iter_structured_summaries_async(query, matches):
+            yield json.dumps({
+                "type": "summary",
+                "supplier_id": results_list[i]["supplier_id"],
+                "structured_summary": doc_summary
+            }) + "\n"
+        yield json.dumps({"type": "done"}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+async def _search_matches(payload: SearchRequest, db: AsyncSession):
+    """
+    Shared first half of the search endpoints.
+    Returns (matched, None) with (match, user, rating) tuples, or
+    (None, response) after creating an open post when nothing matched.
+    """
+    query = payload.query
+    requester_id = payload.requester_id
+     # 1) advanced pipeline search
+    chunk_matches = await rag_pipeline.advanced_search_async(user_query=query, top_k=5, db=db)
+    if chunk_matches:
+        # 2) build final results
+        # chunk_matches is a list of e.g. {"supplier_id":..., "chunk_text":..., "score":...}
+        matched = await _load_match_suppliers(db, chunk_matches)
+        return matched, None
+
+    # no direct match => fallback open post
+    new_post_data = schemas.PostCreate(
+        title=f"Request from advanced search: {query[:30]}",
+        description=query,
+        category="general",
+        status="open",
+        requester_id=requester_id
+    )
+    new_post = await async_repository.create_post(db, new_post_data)
+    return None, {
+        "results": [],
+        "summary": "No direct matches found. Created an open request.",
+        "post_id": new_post.id
+    }
+
+def _match_result(m: dict, sp_user, rating: float) -> dict:
+    return {
+        "supplier_id": m["supplier_id"],
+        "username": sp_user.username,
+        "score": m["score"],
+        "rating": rating,
+        # "chunk_text": m["chunk_text"]
+    }
+
+async def _load_match_suppliers(db: AsyncSession, chunk_matches: list):
+    """
+    Look up the supplier user and rating for each match, with one query
+    for all users and one for all ratings.
+    Returns (match, user, rating) tuples, skipping unknown suppliers.
+    """
+    with_ids = []
+    for m in chunk_matches:
+        if "supplier_id" not in m:
+            # Skip documents without a supplier_id
+            print("DEBUG: Document missing supplier_id:", m)
+            continue
+        with_ids.append(m)
+    supplier_ids = [m["supplier_id"] for m in with_ids]
+    users = await async_repository.get_users_by_ids(db, supplier_ids)
+    ratings = await async_repository.get_supplier_avg_ratings(db, list(users))
+
+    matched = []
+    for m in with_ids:
+        sp_user = users.get(m["supplier_id"])
+        if not sp_user:
+            continue
+        matched.append((m, sp_user, ratings.get(sp_user.id, 0.0)))
+    return matched
+
 @app.put("/suppliers/{supplier_id}/profile")
 def update_user_profile_endpoint(
     supplier_id: str,
@@ -231,10 +487,7 @@ def update_user_profile_endpoint(
         skills=skills
     )
     if role:
-        # If you want to handle multiple roles, you could do:
-        # for r in (role if isinstance(role, list) else [role]):
-        #     store_and_link_service(db, supplier_id, r)
-        # else for single:
+        # a single role or a list of roles, linked in one transaction
         repository.store_and_link_service(db, supplier_id, role)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -298,10 +551,13 @@ def list_bids_for_post(post_id: str, db: Session = Depends(get_db)):
     if not post_obj:
         raise HTTPException(404, "Post not found")
     bids = repository.list_bids_for_post(db, post_id)
+    supplier_ids = [b.supplier_id for b in bids]
+    users = repository.get_users_by_ids(db, supplier_ids)
+    ratings = repository.get_supplier_avg_ratings(db, supplier_ids)
     results = []
     for b in bids:
-        sup_rating = repository.get_supplier_avg_rating(db, b.supplier_id)
-        sup_user = repository.get_user(db, b.supplier_id)
+        sup_rating = ratings.get(b.supplier_id, 0.0)
+        sup_user = users.get(b.supplier_id)
         results.append({
             "bid_id": b.id,
             "supplier_id": b.supplier_id,
@@ -312,7 +568,10 @@ def list_bids_for_post(post_id: str, db: Session = Depends(get_db)):
             "status": b.status
         })
     # Sort verified first, then rating desc
-    results_sorted = sorted(results, key=lambda x: (-(1 if repository.get_user(db, x["supplier_id"]).is_verified else 0), -x["supplier_rating"]))
+    def is_verified(supplier_id):
+        sup_user = users.get(supplier_id)
+        return 1 if sup_user and sup_user.is_verified else 0
+    results_sorted = sorted(results, key=lambda x: (-is_verified(x["supplier_id"]), -x["supplier_rating"]))
     return results_sorted
 
 @app.post("/bids/{bid_id}/accept")
@@ -381,7 +640,11 @@ def create_service(service: schemas.ServiceCreate, db: Session = Depends(get_db)
     """
     Create a new service.
     """
-    return repository.create_service(db=db, service=service)
+    try:
+        return repository.create_service(db=db, service=service)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Service already exists")
 
 @app.get("/services/{service_id}", response_model=schemas.Service)
 def get_service(service_id: str, db: Session = Depends(get_db)):
@@ -0,0 +1,126 @@
+import threading
+import time
+from typing import Dict, FrozenSet, List
+
+import models
+from config import service_catalog_ttl
+
+
+class _CatalogSnapshot:
+    def __init__(self, version: int, service_names: List[str], suppliers_by_service: Dict[str, FrozenSet[str]]):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.service_names = service_names
+        self.suppliers_by_service = suppliers_by_service
+
+
+class ServiceCatalog:
+    """
+    In-process, versioned copy of the services table and the
+    service -> supplier mapping, so routing and filtering a search needs no
+    DB round trips.
+
+    Writes through repository (create_service, link_supplier_service, ...)
+    call invalidate(), which bumps the version; the next read reloads the
+    whole catalog in two queries. Other worker processes don't see that
+    bump, so snapshots also expire after ttl_seconds.
+    """
+
+    def __init__(self, ttl_seconds: float = 60.0):
+        self.ttl_seconds = ttl_seconds
+        self._version = 0
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+
+    def _is_fresh(self, snapshot) -> bool:
+        if snapshot is None or snapshot.version != self._version:
+            return False
+        if self.ttl_seconds and time.monotonic() - snapshot.loaded_at > self.ttl_seconds:
+            return False
+        return True
+
+    def _load(self, db, version: int) -> _CatalogSnapshot:
+        services = db.query(models.Service.id, models.Service.name).all()
+        links = db.query(models.SupplierService.service_id, models.SupplierService.supplier_id).all()
+
+        suppliers_by_id = {}
+        for service_id, supplier_id in links:
+            suppliers_by_id.setdefault(service_id, set()).add(supplier_id)
+
+        service_names = []
+        suppliers_by_service = {}
+        for service_id, name in services:
+            if not name:
+                continue
+            key = name.lower()
+            service_names.append(key)
+            suppliers_by_service[key] = frozenset(
+                suppliers_by_service.get(key, frozenset()) | suppliers_by_id.get(service_id, set())
+            )
+        return _CatalogSnapshot(version, service_names, suppliers_by_service)
+
+    def snapshot(self, db_session_factory, db=None) -> _CatalogSnapshot:
+        """
+        Current snapshot, reloaded when it was invalidated or has expired.
+        The reload uses `db` (e.g. the request's session) when given, and
+        only opens a session from db_session_factory otherwise.
+        """
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            return snapshot
+
+        # version read before loading: an invalidate() that lands mid-load
+        # leaves this snapshot stale, so the next read reloads again
+        version = self._version
+        if db is not None:
+            snapshot = self._load(db, version)
+        else:
+            own_db = db_session_factory()
+            try:
+                snapshot = self._load(own_db, version)
+            finally:
+                own_db.close()
+        with self._lock:
+            if self._snapshot is None or self._snapshot.version <= version:
+                self._snapshot = snapshot
+        return snapshot
+
+    async def snapshot_async(self, db) -> _CatalogSnapshot:
+        """
+        snapshot() for an AsyncSession; the reload runs _load through
+        db.run_sync, so both paths share one loader.
+        """
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            return snapshot
+
+        version = self._version
+        snapshot = await db.run_sync(self._load, version)
+        with self._lock:
+            if self._snapshot is None or self._snapshot.version <= version:
+                self._snapshot = snapshot
+        return snapshot
+
+    async def service_names_async(self, db) -> List[str]:
+        return list((await self.snapshot_async(db)).service_names)
+
+    async def supplier_ids_for_async(self, db, service_name: str) -> FrozenSet[str]:
+        return (await self.snapshot_async(db)).suppliers_by_service.get(service_name.lower(), frozenset())
+
+    def service_names(self, db_session_factory, db=None) -> List[str]:
+        return list(self.snapshot(db_session_factory, db).service_names)
+
+    def supplier_ids_for(self, db_session_factory, service_name: str, db=None) -> FrozenSet[str]:
+        return self.snapshot(db_session_factory, db).suppliers_by_service.get(service_name.lower(), frozenset())
+
+
+# Process-wide catalog used by the search pipeline and invalidated by repository writes.
+service_catalog = ServiceCatalog(ttl_seconds=service_catalog_ttl)
@@ -0,0 +1,70 @@
+from pipeline.enhance_rag_pipeline import merge_supplier_hits
+
+
+def _hit(supplier_id, score, text=""):
+    return {"supplier_id": supplier_id, "score": score, "chunk_text": text}
+
+
+def test_drops_suppliers_outside_the_service():
+    hits = [_hit("a", 0.9), _hit("b", 0.8), _hit("c", 0.7)]
+
+    merged = merge_supplier_hits(hits, valid_supplier_ids=["a", "c"])
+
+    assert [h["supplier_id"] for h in merged] == ["a", "c"]
+
+
+def test_no_filter_keeps_every_supplier():
+    hits = [_hit("a", 0.9), _hit("b", 0.8)]
+
+    assert [h["supplier_id"] for h in merge_supplier_hits(hits)] == ["a", "b"]
+
+
+def test_empty_service_filter_keeps_nothing():
+    assert merge_supplier_hits([_hit("a", 0.9)], valid_supplier_ids=set()) == []
+
+
+def test_keeps_each_suppliers_best_hit():
+    hits = [
+        _hit("a", 0.2, "a low"),
+        _hit("b", 0.5, "b only"),
+        _hit("a", 0.9, "a best"),
+        _hit("a", 0.4, "a mid"),
+    ]
+
+    merged = merge_supplier_hits(hits)
+
+    assert [(h["supplier_id"], h["chunk_text"]) for h in merged] == [("a", "a best"), ("b", "b only")]
+
+
+def test_top_k_returns_the_best_suppliers_best_first():
+    hits = [_hit(str(i), i / 10) for i in range(10)]
+
+    merged = merge_supplier_hits(hits, top_k=3)
+
+    assert [h["supplier_id"] for h in merged] == ["9", "8", "7"]
+
+
+def test_top_k_larger_than_the_suppliers_returns_all():
+    hits = [_hit("a", 0.1), _hit("b", 0.3)]
+
+    assert [h["supplier_id"] for h in merge_supplier_hits(hits, top_k=5)] == ["b", "a"]
+
+
+def test_top_k_counts_suppliers_not_hits():
+    hits = [_hit("a", 0.9), _hit("a", 0.8), _hit("b", 0.7), _hit("c", 0.6)]
+
+    assert [h["supplier_id"] for h in merge_supplier_hits(hits, top_k=2)] == ["a", "b"]
+
+
+def test_skips_hits_without_a_supplier():
+    hits = [{"score": 1.0}, _hit(None, 0.95), _hit("a", 0.5)]
+
+    merged = merge_supplier_hits(hits, top_k=2)
+
+    assert [h["supplier_id"] for h in merged] == ["a"]
+
+
+def test_accepts_a_generator():
+    merged = merge_supplier_hits((_hit(s, score) for s, score in [("a", 0.1), ("b", 0.2)]), top_k=1)
+
+    assert [h["supplier_id"] for h in merged] == ["b"]
@@ -0,0 +1,42 @@
+import os
+import tempfile
+
+from config import max_upload_bytes, upload_chunk_size
+
+
+class UploadTooLarge(ValueError):
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds the {limit} byte limit")
+        self.limit = limit
+
+
+def save_upload_to_tempfile(upload, max_bytes: int = max_upload_bytes, chunk_size: int = upload_chunk_size, suffix=".pdf") -> str:
+    """
+    Copy an UploadFile to a new, uniquely named temp file chunk by chunk, so
+    the upload is never held in memory whole and concurrent uploads with the
+    same filename can't overwrite each other.
+
+    Raises UploadTooLarge (and removes the partial file) as soon as more
+    than max_bytes have been read. The caller owns the returned path.
+    """
+    # Starlette already knows the size of a spooled upload: reject it before copying
+    size = getattr(upload, "size", None)
+    if max_bytes and size is not None and size > max_bytes:
+        raise UploadTooLarge(max_bytes)
+
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=suffix)
+    written = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = upload.file.read(chunk_size)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if max_bytes and written > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                out.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path